@@ -12,10 +12,13 @@ import sys
 
 import astropy.io.fits as fits
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from astropy.table import Table
 import astropy.units as u
 
 from cycler import cycler
+from functools import lru_cache
+from multiprocessing import Pool
 import numpy as np
 
 import copy
@@ -28,11 +31,12 @@ import pyklip.fm as fm
 import pyklip.fmlib.fmpsf as fmpsf
 import shutil
 
-from pyklip import klip, parallelized
+from pyklip import parallelized
 from pyklip.instruments.JWST import JWSTData
 from scipy.ndimage import fourier_shift, gaussian_filter, rotate
 from scipy.ndimage import shift as spline_shift
 from scipy.interpolate import interp1d
+from scipy.stats import t as student_t
 from spaceKLIP import utils as ut
 from spaceKLIP.psf import get_offsetpsf, JWST_PSF
 from spaceKLIP.starphot import get_stellar_magnitudes, read_spec_file
@@ -47,6 +51,8 @@ import logging
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 
+rad2arcsec = 180. / np.pi * 3600.  # arcsec/rad
+
 
 # =============================================================================
 # MAIN
@@ -88,6 +94,7 @@ class AnalysisTools():
                      subdir='rawcon',
                      output_filetype='npy',
                      plot_xlim=(0,10),
+                     make_plots=True,
                      **kwargs):
         """
         Compute the raw contrast relative to the provided host star flux.
@@ -113,8 +120,11 @@ class AnalysisTools():
             Name of the directory where the data products shall be saved. The
             default is 'rawcon'.
         output_filetype : str
-            File type to save the raw contrast information to. Options are 'ecsv'
-            or 'npy'.
+            File type to save the raw contrast information to. Options are 'ecsv',
+            'npy', or 'npz' (all arrays in a single file).
+        make_plots : bool, optional
+            Plot the masked data and the raw contrast curves. Disable to save
+            time when processing many concatenations. The default is True.
         
         Returns
         -------
@@ -146,9 +156,17 @@ class AnalysisTools():
         log.info('Copying starfile {} to {}'.format(starfile, new_starfile_path))
         write_starfile(starfile, new_starfile_path)
 
+        # Stellar magnitudes and filter zero points only depend on the
+        # instrument, so cache them across concatenations.
+        stellar_mags = {}
+
         # Loop through concatenations.
         for i, key in enumerate(self.database.red.keys()):
             log.info('--> Concatenation ' + key)
+
+            # The offset PSF is the same for all FITS files of a
+            # concatenation, so only generate it once.
+            offsetpsf = get_offsetpsf(self.database.obs[key])
             
             # Loop through FITS files.
             nfitsfiles = len(self.database.red[key])
@@ -157,7 +175,10 @@ class AnalysisTools():
                 log.info('Analyzing file ' + self.database.red[key]['FITSFILE'][j])
 
                 # Get stellar magnitudes and filter zero points.
-                mstar, fzero = get_stellar_magnitudes(starfile, spectral_type, self.database.red[key]['INSTRUME'][j], output_dir=output_dir, **kwargs)  # vegamag, Jy
+                instrume = self.database.red[key]['INSTRUME'][j]
+                if instrume not in stellar_mags:
+                    stellar_mags[instrume] = get_stellar_magnitudes(starfile, spectral_type, instrume, output_dir=output_dir, **kwargs)  # vegamag, Jy
+                mstar, fzero = stellar_mags[instrume]
                 
                 tp_comsubst = ut.get_tp_comsubst(self.database.red[key]['INSTRUME'][j],
                                                  self.database.red[key]['SUBARRAY'][j],
@@ -173,7 +194,7 @@ class AnalysisTools():
                 
                 # Compute the pixel area in steradian.
                 pxsc_arcsec = self.database.red[key]['PIXSCALE'][j] # arcsec
-                pxsc_rad = pxsc_arcsec / 3600. / 180. * np.pi  # rad
+                pxsc_rad = pxsc_arcsec / rad2arcsec  # rad
                 pxar = self.database.red[key]['PIXAR_SR'][j]  # sr
                 if np.isnan(pxar):
                     log.warning("PIXAR_SR not found in database, falling back to use PIXSCALE")
@@ -184,7 +205,6 @@ class AnalysisTools():
                 # one in order to obtain the theoretical peak count of the
                 # star.
                 filt = self.database.red[key]['FILTER'][j]
-                offsetpsf = get_offsetpsf(self.database.obs[key])
                 fstar = fzero[filt] / 10.**(mstar[filt] / 2.5) / 1e6 * np.max(offsetpsf)  # MJy
                 # Get PSF subtraction strategy used, for use in plot labels below.
                 psfsub_strategy = f"{head_pri['MODE']} with {head_pri['ANNULI']} annuli." if head_pri['ANNULI']>1 else head_pri['MODE']
@@ -216,26 +236,27 @@ class AnalysisTools():
                         log.info('  Masking out areas for NIRCam bar coronagraph')
                         xr = np.arange(data.shape[-1]) - center[0]
                         yr = np.arange(data.shape[-2]) - center[1]
-                        xx, yy = np.meshgrid(xr, yr)
-                        pa = -np.rad2deg(np.arctan2(xx, yy))
+                        # Broadcast the coordinate axes and convert the angles
+                        # in place to avoid temporary full-size arrays.
+                        pa = np.arctan2(xr[np.newaxis, :], yr[:, np.newaxis])
+                        np.rad2deg(pa, out=pa)
+                        np.negative(pa, out=pa)
                         pa[pa < 0.] += 360.
+                        # Combine the bar masks of all rolls into a single
+                        # mask and apply it to the data only once.
+                        barmask = np.zeros(data.shape[1:], dtype=bool)
                         ww_sci = np.where(self.database.obs[key]['TYPE'] == 'SCI')[0]
                         for ww in ww_sci:
                             roll_ref = self.database.obs[key]['ROLL_REF'][ww]  # deg
-                            pa1 = (90. - 15. + roll_ref) % 360.
-                            pa2 = (90. + 15. + roll_ref) % 360.
-                            if pa1 > pa2:
-                                temp = (pa > pa1) | (pa < pa2)
-                            else:
-                                temp = (pa > pa1) & (pa < pa2)
-                            data[:, temp] = np.nan
-                            pa1 = (270. - 15. + roll_ref) % 360.
-                            pa2 = (270. + 15. + roll_ref) % 360.
-                            if pa1 > pa2:
-                                temp = (pa > pa1) | (pa < pa2)
-                            else:
-                                temp = (pa > pa1) & (pa < pa2)
-                            data[:, temp] = np.nan
+                            for pa0 in [90., 270.]:
+                                pa1 = (pa0 - 15. + roll_ref) % 360.
+                                pa2 = (pa0 + 15. + roll_ref) % 360.
+                                if pa1 > pa2:
+                                    barmask |= (pa > pa1) | (pa < pa2)
+                                else:
+                                    barmask |= (pa > pa1) & (pa < pa2)
+                        ww_bar = np.where(barmask)
+                        data[:, ww_bar[0], ww_bar[1]] = np.nan
                 elif self.database.red[key]['EXP_TYPE'][j] in ['MIR_4QPM']:
                     # This is MIRI 4QPM data, want to mask edges. However, close
                     # to the center you don't have a choice. So, want to use 
@@ -263,8 +284,8 @@ class AnalysisTools():
                     # Define circle mask for center
                     circ_rad = 15*samp #pixels
                     yarr, xarr = np.ogrid[:nanmask.shape[0], :nanmask.shape[1]]
-                    rad_dist = np.sqrt((xarr-(center[0]+pad)*samp)**2 + (yarr-(center[1]+pad)*samp)**2)
-                    circ = rad_dist < circ_rad
+                    rad_dist2 = (xarr-(center[0]+pad)*samp)**2 + (yarr-(center[1]+pad)*samp)**2
+                    circ = rad_dist2 < circ_rad**2
 
                     # Loop over images
                     ww_sci = np.where(self.database.obs[key]['TYPE'] == 'SCI')[0]
@@ -299,91 +320,87 @@ class AnalysisTools():
                     raise NotImplementedError()
                 
                 # Mask companions.
-                if companions is not None:
+                if companions is not None and len(companions) > 0:
 
                     log.info(f'  Masking out {len(companions)} known companions using provided parameters.')
-                    for k in range(len(companions)):
-                        ra, dec, rad = companions[k]  # arcsec, arcsec, lambda/D
-                        yy, xx = np.indices(data.shape[1:])  # pix
-                        rr = np.sqrt((xx - center[0] + ra / pxsc_arcsec)**2 + (yy - center[1] - dec / pxsc_arcsec)**2)  # pix
-                        rad *= resolution  # pix
-                        data[:, rr <= rad] = np.nan
+                    ra, dec, rad = np.array(companions, dtype=float).reshape(-1, 3).T  # arcsec, arcsec, lambda/D
+                    cx = center[0] - ra / pxsc_arcsec  # pix
+                    cy = center[1] + dec / pxsc_arcsec  # pix
+                    rad = rad * resolution  # pix
+
+                    # Compute the squared distance to all companions at once
+                    # and combine them into a single mask.
+                    yy, xx = get_pixel_indices(*data.shape[1:])  # pix
+                    rr2 = (xx[None] - cx[:, None, None])**2 + (yy[None] - cy[:, None, None])**2  # pix^2
+                    ww = np.where(np.any(rr2 <= (rad**2)[:, None, None], axis=0))
+                    data[:, ww[0], ww[1]] = np.nan
                 
-                # Compute raw contrast.
-                seps = []
-                cons = []
+                # Compute raw contrast for all KL modes at once. The contrast
+                # normalized data is only allocated once and reused below.
                 log.info(f'  Measuring raw contrast in annuli')
-                for k in range(data.shape[0]):
-                    sep, con = klip.meas_contrast(dat=data[k] * pxar / fstar, iwa=iwa, owa=owa, resolution=resolution, center=center, low_pass_filter=False)
-                    seps += [sep * self.database.red[key]['PIXSCALE'][j]]   # arcsec
-                    cons += [con]
-                seps = np.array(seps)
-                cons = np.array(cons)
+                data_con = data * (pxar / fstar)
+                sep, cons = meas_contrast_cube(dat=data_con, iwa=iwa, owa=owa, resolution=resolution, center=center)
+                seps = np.tile(sep * self.database.red[key]['PIXSCALE'][j], (data.shape[0], 1))  # arcsec
                 
                 # If available, apply the coronagraphic transmission before
                 # computing the raw contrast.
                 if mask is not None:
-                    cons_mask = []
                     log.info(f'  Measuring raw contrast for masked data')
-                    for k in range(data.shape[0]):
-                        _, con_mask = klip.meas_contrast(dat=np.true_divide(data[k], mask) * pxar / fstar, iwa=iwa, owa=owa, resolution=resolution, center=center, low_pass_filter=False)
-                        cons_mask += [con_mask]
-                    cons_mask = np.array(cons_mask)
+                    np.true_divide(data_con, mask, out=data_con)
+                    _, cons_mask = meas_contrast_cube(dat=data_con, iwa=iwa, owa=owa, resolution=resolution, center=center)
+                del data_con
                 
-                # Plot masked data.
                 klmodes = self.database.red[key]['KLMODES'][j].split(',')
                 fitsfile = os.path.join(output_dir, os.path.split(fitsfile)[1])
-                with plt.style.context('spaceKLIP.sk_style'):
-                    fig = plt.figure(figsize=(6.4, 4.8))
-                    ax = plt.gca()
-                    xx = np.arange(data.shape[2]) - center[0]  # pix
-                    yy = np.arange(data.shape[1]) - center[1]  # pix
-                    extent = (-(xx[0] - 0.5) * pxsc_arcsec, -(xx[-1] + 0.5) * pxsc_arcsec, (yy[0] - 0.5) * pxsc_arcsec, (yy[-1] + 0.5) * pxsc_arcsec)
-                    vmax = np.nanmax(data[-1])
-                    ax.imshow(data[-1], origin='lower', cmap='inferno',
-                            norm=matplotlib.colors.SymLogNorm(vmin=-vmax, vmax=vmax, linthresh=vmax/100 ),
-                            extent=extent)
-                    ax.set_xlabel(r'$\Delta$RA [arcsec]')
-                    ax.set_ylabel(r'$\Delta$Dec [arcsec]')
-                    ax.set_title(f'Masked data in {filt}, {psfsub_strategy} ({klmodes[-1]} KL)')
-                    for r in [5,10]:
-                        ax.add_patch(matplotlib.patches.Circle((0,0), r, ls='--', facecolor='none', edgecolor='cyan', clip_on=True))
-                        ax.text(r, 0, f" {r}''", color='cyan')
-                    import textwrap
-                    ax.text(0.01, 0.99, textwrap.fill(os.path.basename(fitsfile), width=40),
-                                        transform=ax.transAxes, color='black', verticalalignment='top', fontsize=9)
-                    plt.colorbar(mappable=ax.images[0], label=self.database.red[key]['BUNIT'][j])
-                    plt.tight_layout()
-                    plt.savefig(fitsfile[:-5] + '_masked.pdf')
-                    plt.close(fig)
-
-                # Plot raw contrast.
-                klmodes = self.database.red[key]['KLMODES'][j].split(',')
-                fitsfile = os.path.join(output_dir, os.path.split(fitsfile)[1])
-                colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
-                mod = len(colors)
-                with plt.style.context('spaceKLIP.sk_style'):
-                    fig = plt.figure(figsize=(6.4, 4.8))
-                    ax = plt.gca()
-                    for k in range(data.shape[0]):
-                        if mask is None:
-                            ax.plot(seps[k], cons[k], color=colors[k % mod], label=klmodes[k] + ' KL')
-                        else:
-                            ax.plot(seps[k], cons[k], color=colors[k % mod], alpha=0.3, ls='--')
-                            ax.plot(seps[k], cons_mask[k], color=colors[k % mod], label=klmodes[k] + ' KL')
-                    ax.set_yscale('log')
-                    ax.set_ylim([None,1])
-                    if plot_xlim is not None:
-                        ax.set_xlim(plot_xlim)
-                    ax.set_xlabel('Separation [arcsec]')
-                    ax.set_ylabel(r'5-$\sigma$ contrast')
-                    ax.legend(loc='upper right', ncols=3,
-                            title=None if mask is None else 'Dashed lines exclude coronagraph mask throughput',
-                            title_fontsize=10)
-                    ax.set_title(f'Raw contrast in {filt}, {psfsub_strategy}')
-                    plt.tight_layout()
-                    plt.savefig(fitsfile[:-5] + '_rawcon.pdf')
-                    plt.close(fig)
+                if make_plots:
+                    # Plot masked data.
+                    with plt.style.context('spaceKLIP.sk_style'):
+                        fig = Figure(figsize=(6.4, 4.8))
+                        ax = fig.gca()
+                        xx = np.arange(data.shape[2]) - center[0]  # pix
+                        yy = np.arange(data.shape[1]) - center[1]  # pix
+                        extent = (-(xx[0] - 0.5) * pxsc_arcsec, -(xx[-1] + 0.5) * pxsc_arcsec, (yy[0] - 0.5) * pxsc_arcsec, (yy[-1] + 0.5) * pxsc_arcsec)
+                        vmax = np.nanmax(data[-1])
+                        ax.imshow(data[-1], origin='lower', cmap='inferno',
+                                norm=matplotlib.colors.SymLogNorm(vmin=-vmax, vmax=vmax, linthresh=vmax/100 ),
+                                extent=extent)
+                        ax.set_xlabel(r'$\Delta$RA [arcsec]')
+                        ax.set_ylabel(r'$\Delta$Dec [arcsec]')
+                        ax.set_title(f'Masked data in {filt}, {psfsub_strategy} ({klmodes[-1]} KL)')
+                        for r in [5,10]:
+                            ax.add_patch(matplotlib.patches.Circle((0,0), r, ls='--', facecolor='none', edgecolor='cyan', clip_on=True))
+                            ax.text(r, 0, f" {r}''", color='cyan')
+                        import textwrap
+                        ax.text(0.01, 0.99, textwrap.fill(os.path.basename(fitsfile), width=40),
+                                            transform=ax.transAxes, color='black', verticalalignment='top', fontsize=9)
+                        fig.colorbar(mappable=ax.images[0], label=self.database.red[key]['BUNIT'][j])
+                        fig.tight_layout()
+                        fig.savefig(fitsfile[:-5] + '_masked.pdf')
+
+                    # Plot raw contrast.
+                    colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+                    mod = len(colors)
+                    with plt.style.context('spaceKLIP.sk_style'):
+                        fig = Figure(figsize=(6.4, 4.8))
+                        ax = fig.gca()
+                        for k in range(data.shape[0]):
+                            if mask is None:
+                                ax.plot(seps[k], cons[k], color=colors[k % mod], label=klmodes[k] + ' KL')
+                            else:
+                                ax.plot(seps[k], cons[k], color=colors[k % mod], alpha=0.3, ls='--')
+                                ax.plot(seps[k], cons_mask[k], color=colors[k % mod], label=klmodes[k] + ' KL')
+                        ax.set_yscale('log')
+                        ax.set_ylim([None,1])
+                        if plot_xlim is not None:
+                            ax.set_xlim(plot_xlim)
+                        ax.set_xlabel('Separation [arcsec]')
+                        ax.set_ylabel(r'5-$\sigma$ contrast')
+                        ax.legend(loc='upper right', ncols=3,
+                                title=None if mask is None else 'Dashed lines exclude coronagraph mask throughput',
+                                title_fontsize=10)
+                        ax.set_title(f'Raw contrast in {filt}, {psfsub_strategy}')
+                        fig.tight_layout()
+                        fig.savefig(fitsfile[:-5] + '_rawcon.pdf')
 
                 if output_filetype.lower()=='ecsv':
                     # Save outputs as astropy ECSV text tables
@@ -412,8 +429,16 @@ class AnalysisTools():
                     if mask is not None:
                         np.save(fitsfile[:-5] + '_cons_mask.npy', cons_mask)
                     print(f"Contrast results and plots saved to {fitsfile[:-5] + '_seps.npy'}, {fitsfile[:-5] + '_cons.npy'}")
+                elif output_filetype.lower()=='npz':
+                    # Save outputs as a single numpy .npz file
+                    output_fn = fitsfile[:-5] + '_rawcon.npz'
+                    if mask is not None:
+                        np.savez(output_fn, seps=seps, cons=cons, cons_mask=cons_mask)
+                    else:
+                        np.savez(output_fn, seps=seps, cons=cons)
+                    print(f"Contrast results and plots saved to {output_fn}")
                 else:
-                    raise ValueError('File save format not supported, options are "npy" or "ecsv".')
+                    raise ValueError('File save format not supported, options are "npy", "npz", or "ecsv".')
 
 
     def calibrate_contrast(self,
@@ -428,6 +453,8 @@ class AnalysisTools():
                            use_saved=False,
                            thrput_fit_method='median',
                            plot_xlim=(0,10),
+                           nproc=1,
+                           make_plots=True,
                            **kwargs
                            ):
         """ 
@@ -442,7 +469,7 @@ class AnalysisTools():
             Name of the directory where the raw contrast data products have been 
             saved. The default is 'rawcon'.
         rawcon_filetype : str
-            Save filetype of the raw contrast files. 
+            Save filetype of the raw contrast files, 'npy' or 'npz'.
         companions : list of list of three float, optional
             List of companions to be masked before computing the raw contrast.
             For each companion, there should be a three element list containing
@@ -461,11 +488,18 @@ class AnalysisTools():
             to inject only one companion at a time (lambda/D).
         use_saved : bool, optional
             Toggle to use existing saved injected and recovered fluxes instead of
-            repeating the process. 
+            repeating the process. Files without saved results are still
+            processed.
         thrput_fit_method : str, optional
             Method to use when fitting/interpolating the measure KLIP throughputs 
             across all of the injection positions. 'median' for a median of PAs at
             with the same separation. 'log_grow' for a logistic growth function.
+        nproc : int, optional
+            Number of processes used to retrieve the fluxes of the injected
+            companions. The default is 1.
+        make_plots : bool, optional
+            Plot the measured KLIP throughputs and the calibrated contrast
+            curves. The default is True.
             
         Returns
         -------
@@ -491,6 +525,17 @@ class AnalysisTools():
         if not os.path.exists(rawcon_dir):
             raise TypeError('Raw contrast must be calculated first. "rawcon" subdirectory not found.')
 
+        # Get the stellar model used for the raw contrast. This is the same
+        # for all concatenations, so only parse it once.
+        ccinfo = os.path.join(rawcon_dir, 'contrast_curve_info.txt')
+        with open(ccinfo) as cci:
+            starfile, spectral_type = cci.readline().strip('\n').split(' /// ')
+            starfile = os.path.join(rawcon_dir, starfile.replace('#',''))
+
+        # Stellar magnitudes and filter zero points only depend on the
+        # instrument, so cache them across concatenations.
+        stellar_mags = {}
+
         # Loop through concatenations.
         for i, key in enumerate(self.database.red.keys()):
             log.info('--> Concatenation ' + key)
@@ -503,6 +548,11 @@ class AnalysisTools():
             else:
                 offsetpsf = get_offsetpsf(self.database.obs[key])
 
+            # The Stage 2 files are the same for all FITS files of a
+            # concatenation, so only look them up once.
+            filepaths, psflib_filepaths = get_pyklip_filepaths(self.database, key)
+            pop_pxar_kw(np.append(filepaths, psflib_filepaths))
+
             # Loop through FITS files.
             nfitsfiles = len(self.database.red[key])
             for j in range(nfitsfiles):
@@ -515,8 +565,22 @@ class AnalysisTools():
 
                 log.info('Analyzing file ' + fitsfile)
 
-                # Get the raw contrast information with and without mask correction
+                # Check which saved injection and recovery results exist
+                # without reading them.
                 file_str = fitsfile.split('/')[-1]
+                save_string = output_dir+'/'+file_str[:-5]
+                injrec_npz = save_string+'_injrec.npz'
+                injrec_npys = [save_string+'_injrec_'+name+'.npy' for name in ['seps', 'pas', 'inj_fluxes', 'retr_fluxes']]
+                load_saved = False
+                if use_saved:
+                    if os.path.exists(injrec_npz) or all(os.path.exists(npy) for npy in injrec_npys):
+                        load_saved = True
+                    else:
+                        log.warning('No saved companion injection and recovery results found for ' + file_str + ', these will be computed.')
+                        if not isinstance(offsetpsf, np.ndarray):
+                            offsetpsf = get_offsetpsf(self.database.obs[key])
+
+                # Get the raw contrast information with and without mask correction
                 if rawcon_filetype == 'npy':
                     seps_file = file_str.replace('.fits', '_seps.npy') #Arcseconds
                     rawcons_file = file_str.replace('.fits', '_cons.npy')
@@ -525,22 +589,26 @@ class AnalysisTools():
                     rawseps = np.load(os.path.join(rawcon_dir,seps_file))
                     rawcons = np.load(os.path.join(rawcon_dir,rawcons_file))
                     maskcons = np.load(os.path.join(rawcon_dir,maskcons_file))
+                elif rawcon_filetype == 'npz':
+                    rawcon_file = file_str.replace('.fits', '_rawcon.npz')
+                    with np.load(os.path.join(rawcon_dir,rawcon_file)) as rawcon_data:
+                        rawseps = rawcon_data['seps'] #Arcseconds
+                        rawcons = rawcon_data['cons']
+                        maskcons = rawcon_data['cons_mask']
                 elif rawcon_filetype == 'ecsv':
                     raise NotImplementedError('.ecsv save format not currently supported for \
-                        calibrated contrasts. Please use .npy raw contrasts as input.')
+                        calibrated contrasts. Please use .npy or .npz raw contrasts as input.')
                     # contrast_file = file_str.replace('.fits', '_contrast.ecsv')
                     # contrast_path =  os.path.join(rawcon_dir, contrast_file)
 
                     # rawcon_data = Table.read(contrast_path, format='ascii.ecsv')
 
-                # Read Stage 2 files and make pyKLIP dataset
-                filepaths, psflib_filepaths = get_pyklip_filepaths(self.database, key)
-                pop_pxar_kw(np.append(filepaths, psflib_filepaths))
+                # Make pyKLIP dataset from the Stage 2 files
                 pyklip_dataset = JWSTData(filepaths, psflib_filepaths)
 
                 # Compute the resolution element. Account for possible blurring.
                 pxsc_arcsec = self.database.red[key]['PIXSCALE'][j] # arcsec
-                pxsc_rad = pxsc_arcsec / 3600. / 180. * np.pi  # rad
+                pxsc_rad = pxsc_arcsec / rad2arcsec  # rad
                 if self.database.red[key]['TELESCOP'][j] == 'JWST':
                     if self.database.red[key]['EXP_TYPE'][j] in ['NRC_CORON']:
                         diam = 5.2
@@ -554,18 +622,17 @@ class AnalysisTools():
                 resolution_fwhm = 1.025*resolution
 
                 # Get stellar magnitudes and filter zero points, but use the same file as rawcon
-                ccinfo = os.path.join(rawcon_dir, 'contrast_curve_info.txt')
-                with open(ccinfo) as cci:
-                    starfile, spectral_type = cci.readline().strip('\n').split(' /// ')
-                    starfile = os.path.join(rawcon_dir, starfile.replace('#',''))
-                mstar, fzero = get_stellar_magnitudes(starfile,
-                                                      spectral_type,
-                                                      self.database.red[key]['INSTRUME'][j],
-                                                      output_dir=output_dir,
-                                                      **kwargs)  # vegamag, Jy
+                instrume = self.database.red[key]['INSTRUME'][j]
+                if instrume not in stellar_mags:
+                    stellar_mags[instrume] = get_stellar_magnitudes(starfile,
+                                                                    spectral_type,
+                                                                    instrume,
+                                                                    output_dir=output_dir,
+                                                                    **kwargs)  # vegamag, Jy
+                mstar, fzero = stellar_mags[instrume]
                 filt = self.database.red[key]['FILTER'][j]
                 fstar = fzero[filt] / 10.**(mstar[filt] / 2.5) / 1e6 * np.max(offsetpsf)  # MJy
-                fstar *= ((180./np.pi)*3600.)**2/pxsc_arcsec**2 # MJy/sr
+                fstar /= pxsc_rad**2 # MJy/sr
                 # Get PSF subtraction strategy used, for use in plot labels below.
                 psfsub_strategy = f"{head_pri['MODE']} with {head_pri['ANNULI']} annuli." if head_pri['ANNULI']>1 else head_pri['MODE']
 
@@ -639,13 +706,18 @@ class AnalysisTools():
                     os.makedirs(inj_output_dir)
                 klip_args['outputdir'] = inj_output_dir
 
-                save_string = output_dir+'/'+file_str[:-5]
-                if use_saved:
+                if load_saved:
                     log.info('Retrieving saved companion injection and recovery results.')
-                    all_inj_seps = np.load(save_string + '_injrec_seps.npy')
-                    all_inj_pas = np.load(save_string+'_injrec_pas.npy')
-                    all_inj_fluxes = np.load(save_string+'_injrec_inj_fluxes.npy')
-                    all_retr_fluxes = np.load(save_string+'_injrec_retr_fluxes.npy')
+                    if os.path.exists(injrec_npz):
+                        with np.load(injrec_npz) as injrec_data:
+                            all_inj_seps = injrec_data['seps']
+                            all_inj_pas = injrec_data['pas']
+                            all_inj_fluxes = injrec_data['inj_fluxes']
+                            all_retr_fluxes = injrec_data['retr_fluxes']
+                    else:
+                        # Fall back to the individual files written by older
+                        # versions.
+                        all_inj_seps, all_inj_pas, all_inj_fluxes, all_retr_fluxes = [np.load(npy) for npy in injrec_npys]
                 else:
                     # Run the injection and recovery process
                     log.info('Injecting and recovering synthetic companions. This may take a while...')
@@ -657,16 +729,18 @@ class AnalysisTools():
                                                  injection_fluxes=inj_fluxes, 
                                                  klip_args=klip_args,
                                                  retrieve_fwhm=resolution_fwhm,
-                                                 true_companions=companions_pix)
+                                                 true_companions=companions_pix,
+                                                 nproc=nproc)
 
                     # Unpack everything from the injection and recovery
                     all_inj_seps, all_inj_pas, all_inj_fluxes, all_retr_fluxes = inj_rec
 
-                    # Save these arrays
-                    np.save(save_string+'_injrec_seps.npy', all_inj_seps)
-                    np.save(save_string+'_injrec_pas.npy', all_inj_pas)
-                    np.save(save_string+'_injrec_inj_fluxes.npy', all_inj_fluxes)
-                    np.save(save_string+'_injrec_retr_fluxes.npy', all_retr_fluxes)
+                    # Save these arrays to a single file
+                    np.savez(injrec_npz,
+                             seps=all_inj_seps,
+                             pas=all_inj_pas,
+                             inj_fluxes=all_inj_fluxes,
+                             retr_fluxes=all_retr_fluxes)
 
                 # Need to add a point at a separation of zero pixels, assume
                 # basically no flux retrieved at zero separation. 
@@ -733,108 +807,105 @@ class AnalysisTools():
                 np.save(save_string+'_cal_cons.npy', rawcons_corr)
                 np.save(save_string+'_cal_maskcons.npy', maskcons_corr)
 
-                # Define some local utilty functions for plot setup.
-                # This makes the plotting code below less repetitive and more consistent
-                @plt.style.context('spaceKLIP.sk_style')
-                def standardize_plots_setup():
-                    fig = plt.figure(figsize=(6.4, 4.8))
-                    ax = plt.gca()
-                    color = plt.cm.tab10(np.linspace(0, 1, 10))
-                    cc = (cycler(linestyle=['-', ':', '--'])*cycler(color=color))
-                    ax.set_prop_cycle(cc)
-                    return fig, ax
-
-                @plt.style.context('spaceKLIP.sk_style')
-                def standardize_plots_annotate_save(ax, title="",
+                if make_plots:
+                    # Define some local utilty functions for plot setup.
+                    # This makes the plotting code below less repetitive and more consistent
+                    @plt.style.context('spaceKLIP.sk_style')
+                    def standardize_plots_setup():
+                        fig = Figure(figsize=(6.4, 4.8))
+                        ax = fig.gca()
+                        color = plt.cm.tab10(np.linspace(0, 1, 10))
+                        cc = (cycler(linestyle=['-', ':', '--'])*cycler(color=color))
+                        ax.set_prop_cycle(cc)
+                        return fig, ax
+
+                    @plt.style.context('spaceKLIP.sk_style')
+                    def standardize_plots_annotate_save(fig, ax, title="",
+                                                        ylabel='Throughput',
+                                                        xlim=plot_xlim,
+                                                        filename=None):
+                        ax.set_xlabel('Separation (")')
+                        ax.set_title(title, fontsize=11)
+                        if ylabel=='Throughput':
+                            ax.set_ylim(0,1)
+                            ax.set_ylabel('Throughput')
+                        else: # or else it's contrast on a log scale
+                            ax.set_yscale('log')
+                            ax.set_ylabel(r'5-$\sigma$ contrast')
+                            ax.set_ylim(None, 1)
+                        if xlim is not None:
+                            ax.set_xlim(*xlim)
+                        ax.grid(axis='both', alpha=0.15)
+                        if filename is not None:
+                            fig.savefig(filename,
+                                        bbox_inches='tight', dpi=300)
+
+
+
+
+                    # Plot measured KLIP throughputs, for all KL modes
+                    fig, ax = standardize_plots_setup()
+
+                    for ci, corr in enumerate(all_corrections):
+                        KLmodes = klip_args['numbasis'][ci]
+                        ax.plot(rawseps[ci], corr, label='KL = {}'.format(KLmodes))
+                    ax.legend(ncol=3, fontsize=10)
+                    standardize_plots_annotate_save(fig, ax, title=f'Injected companions in {filt}, {psfsub_strategy}, all KL modes',
                                                     ylabel='Throughput',
-                                                    xlim=plot_xlim,
-                                                    filename=None):
-                    ax.set_xlabel('Separation (")')
-                    ax.set_title(title, fontsize=11)
-                    if ylabel=='Throughput':
-                        ax.set_ylim(0,1)
-                        ax.set_ylabel('Throughput')
-                    else: # or else it's contrast on a log scale
-                        ax.set_yscale('log')
-                        ax.set_ylabel(r'5-$\sigma$ contrast')
-                        ax.set_ylim(None, 1)
-                    if xlim is not None:
-                        ax.set_xlim(*xlim)
-                    ax.grid(axis='both', alpha=0.15)
-                    if filename is not None:
-                        plt.savefig(filename,
-                                    bbox_inches='tight', dpi=300)
-
-
-
-
-                # Plot measured KLIP throughputs, for all KL modes
-                fig, ax = standardize_plots_setup()
-
-                for ci, corr in enumerate(all_corrections):
-                    KLmodes = klip_args['numbasis'][ci]
-                    ax.plot(rawseps[ci], corr, label='KL = {}'.format(KLmodes))
-                ax.legend(ncol=3, fontsize=10)
-                standardize_plots_annotate_save(ax, title=f'Injected companions in {filt}, {psfsub_strategy}, all KL modes',
-                                                ylabel='Throughput',
-                                                filename=save_string + '_allKL_throughput.pdf')
-                plt.close(fig)
-
-
-                # Plot individual measurements for median KL mode
-                fig, ax = standardize_plots_setup()
-
-                ax.plot(rawseps[median_KL_index], 
-                        all_corrections[median_KL_index],
-                        label='Applied Correction',
-                        color='#0B5345', zorder=100)
-                ax.scatter(all_inj_seps, 
-                           all_retr_fluxes[:,median_KL_index]/all_inj_fluxes, 
-                           s=75, 
-                           color='mediumaquamarine', 
-                           alpha=0.5,
-                           label='Individual Injections')
-                ax.legend(fontsize=10)
-                standardize_plots_annotate_save(ax,
-                                                title=f"Injected companions in {filt}, {psfsub_strategy}, for KL={klip_args['numbasis'][median_KL_index]}",
-                                                ylabel='Throughput',
-                                                filename=save_string + '_medKL_throughput.pdf')
-                plt.close(fig)
-
-
-                # Plot calibrated contrast curves
-                fig, ax = standardize_plots_setup()
-                for si, seps in enumerate(rawseps):
-                    KLmodes = klip_args['numbasis'][si]
-                    ax.plot(seps, maskcons_corr[si],
-                            label=f'KL = {KLmodes}', color=f'C{si}')
-                    ax.plot(seps, rawcons_corr[si], alpha=0.3, ls='--',
-                            color=f'C{si}')
-                ax.legend(loc='upper right', ncols=3, fontsize=10,
-                          title = 'Dashed lines exclude coronagraph mask throughput',
-                          title_fontsize=10)
-                standardize_plots_annotate_save(ax,
-                                                title=f'Calibrated contrast in {filt}, {psfsub_strategy}',
-                                                ylabel='Contrast',
-                                                filename=save_string + '_calcon.pdf')
-                plt.close(fig)
-
-                # Plot calibrated contrast curves compared to raw
-                fig, ax = standardize_plots_setup()
-                for si, seps in enumerate(rawseps):
-                    KLmodes = klip_args['numbasis'][si]
-                    ax.plot(seps, maskcons_corr[si],
-                            label=f'KL = {KLmodes}', color=f'C{si}')
-                    ax.plot(seps, maskcons[si], alpha=0.3, ls=':',
-                            color=f'C{si}')
-                ax.legend(loc='upper right', ncols=3, fontsize=10,
-                          title = 'Solid lines = calibrated, dotted lines = raw',
-                          title_fontsize=10)
-                standardize_plots_annotate_save(ax,
-                                                title=f'Calibrated contrast vs Raw contrast in {filt}, {psfsub_strategy}',
-                                                ylabel='Contrast',
-                                                filename=save_string + '_calcon_vs_rawcon.pdf')
-                plt.close(fig)
+                                                    filename=save_string + '_allKL_throughput.pdf')
+
+
+                    # Plot individual measurements for median KL mode
+                    fig, ax = standardize_plots_setup()
+
+                    ax.plot(rawseps[median_KL_index], 
+                            all_corrections[median_KL_index],
+                            label='Applied Correction',
+                            color='#0B5345', zorder=100)
+                    ax.scatter(all_inj_seps, 
+                               all_retr_fluxes[:,median_KL_index]/all_inj_fluxes, 
+                               s=75, 
+                               color='mediumaquamarine', 
+                               alpha=0.5,
+                               label='Individual Injections')
+                    ax.legend(fontsize=10)
+                    standardize_plots_annotate_save(fig, ax,
+                                                    title=f"Injected companions in {filt}, {psfsub_strategy}, for KL={klip_args['numbasis'][median_KL_index]}",
+                                                    ylabel='Throughput',
+                                                    filename=save_string + '_medKL_throughput.pdf')
+
+
+                    # Plot calibrated contrast curves
+                    fig, ax = standardize_plots_setup()
+                    for si, seps in enumerate(rawseps):
+                        KLmodes = klip_args['numbasis'][si]
+                        ax.plot(seps, maskcons_corr[si],
+                                label=f'KL = {KLmodes}', color=f'C{si}')
+                        ax.plot(seps, rawcons_corr[si], alpha=0.3, ls='--',
+                                color=f'C{si}')
+                    ax.legend(loc='upper right', ncols=3, fontsize=10,
+                              title = 'Dashed lines exclude coronagraph mask throughput',
+                              title_fontsize=10)
+                    standardize_plots_annotate_save(fig, ax,
+                                                    title=f'Calibrated contrast in {filt}, {psfsub_strategy}',
+                                                    ylabel='Contrast',
+                                                    filename=save_string + '_calcon.pdf')
+
+                    # Plot calibrated contrast curves compared to raw
+                    fig, ax = standardize_plots_setup()
+                    for si, seps in enumerate(rawseps):
+                        KLmodes = klip_args['numbasis'][si]
+                        ax.plot(seps, maskcons_corr[si],
+                                label=f'KL = {KLmodes}', color=f'C{si}')
+                        ax.plot(seps, maskcons[si], alpha=0.3, ls=':',
+                                color=f'C{si}')
+                    ax.legend(loc='upper right', ncols=3, fontsize=10,
+                              title = 'Solid lines = calibrated, dotted lines = raw',
+                              title_fontsize=10)
+                    standardize_plots_annotate_save(fig, ax,
+                                                    title=f'Calibrated contrast vs Raw contrast in {filt}, {psfsub_strategy}',
+                                                    ylabel='Contrast',
+                                                    filename=save_string + '_calcon_vs_rawcon.pdf')
 
     def extract_companions(self,
                            companions,
@@ -952,7 +1023,7 @@ class AnalysisTools():
                 
                 # Compute the pixel area in steradian.
                 pxsc_arcsec = self.database.red[key]['PIXSCALE'][j] # arcsec
-                pxsc_rad = pxsc_arcsec / 3600. / 180. * np.pi  # rad
+                pxsc_rad = pxsc_arcsec / rad2arcsec  # rad
                 pxar = self.database.red[key]['PIXAR_SR'][j]  # sr
                 if np.isnan(pxar):
                     log.warning("PIXAR_SR not found in database, falling back to use PIXSCALE")
@@ -1776,7 +1847,8 @@ def inject_and_recover(raw_dataset,
                        injection_fluxes,
                        klip_args,
                        retrieve_fwhm,
-                       true_companions=None):
+                       true_companions=None,
+                       nproc=1):
     '''
     Function to inject synthetic PSFs into a pyKLIP dataset, then perform
     KLIP subtraction, then calculate the flux losses from the KLIP process. 
@@ -1809,6 +1881,9 @@ def inject_and_recover(raw_dataset,
         For each companion, there should be a three element list containing
         [RA offset (pixels), Dec offset (pixels), mask radius (pixels)].
         The default is None.
+    nproc : int, optional
+        Number of processes used to retrieve the fluxes of the injected
+        companions. The default is 1.
 
     Returns
     -------
@@ -1850,10 +1925,10 @@ def inject_and_recover(raw_dataset,
                     # Convert position to x-y (RA-DEC) offset in pixels
                     inj_ra = injection_seps[i]*np.sin(np.deg2rad(injection_pas[j])) # pixels
                     inj_de = injection_seps[i]*np.cos(np.deg2rad(injection_pas[j])) # pixels
-                    # Calculate distance to companion
-                    dist = np.sqrt((tcomp_ra-inj_ra)**2+(tcomp_de-inj_de)**2)
+                    # Calculate squared distance to companion
+                    dist2 = (tcomp_ra-inj_ra)**2+(tcomp_de-inj_de)**2
                     #Check if too close, if so, lie to the code and say its already injected
-                    if dist < tcomp_rad:
+                    if dist2 < tcomp_rad**2:
                         list_of_injected += [pos_id]
     if len(list_of_injected) != 0:
         log.info('--> {}/{} source positions not suitable for injection.'.format(len(list_of_injected), 
@@ -1963,43 +2038,54 @@ def inject_and_recover(raw_dataset,
             # Now need to recover the flux by fitting a 2D Gaussian, mainly interested in the peak
             # flux so this is an okay approximation. Could improve in the future. 
             klipped_file = klip_args['outputdir'] + fileprefix + '-KLmodes-all.fits'
-            with fits.open(klipped_file) as hdul:
+            # Read the KL-mode cube in one go and release the file before
+            # the (slow) flux retrieval below.
+            with fits.open(klipped_file, memmap=False) as hdul:
                 klipped_data = hdul[0].data
-                frame_ids = range(klipped_data.shape[0])
-                centers = [[hdul[0].header['PSFCENTX'], hdul[0].header['PSFCENTY']] for c in frame_ids]
-                # Get fluxes for all companions that were injected, for all KL modes used. 
-                for inj_id in current_injected:
-                    inj_j = inj_id % Npa 
-                    inj_i = (inj_id - inj_j) // Npa 
-                    inj_sep = injection_seps[inj_i]
-                    inj_pa = injection_pas[inj_j]
-                    inj_flux = injection_fluxes[inj_i]
-                    
-                    # Need to loop over each KL mode individually due to pyKLIP subtleties,
-                    # basically the same as what pyKLIP would be doing anyway. 
-                    retrieved_fluxes = []
-                    for img_i in range(klipped_data.shape[0]):
-                        retrieved_flux = fakes.retrieve_planet_flux(frames=klipped_data[img_i], 
-                                                                      centers=centers[img_i], 
-                                                                      astr_hdrs=dataset.output_wcs[0], 
-                                                                      sep=inj_sep, 
-                                                                      pa=inj_pa,
-                                                                      searchrad=5, 
-                                                                      guessfwhm=retrieve_fwhm,
-                                                                      guesspeak=inj_flux, 
-                                                                      refinefit=True)
-                        retrieved_fluxes.append(retrieved_flux)
-                    retrieved_fluxes = np.array(retrieved_fluxes) #Convert to numpy array
-
-                    # Flux should never be negative, if it is, assume ~=zero flux retrieved
-                    neg_mask = np.where(retrieved_fluxes < 0)
-                    retrieved_fluxes[neg_mask]=1e-10 
-
-                    # Need to save things to some arrays
-                    all_seps += [inj_sep]
-                    all_pas += [inj_pa]
-                    all_inj_fluxes += [inj_flux]
-                    all_retr_fluxes += [retrieved_fluxes]
+                klipped_center = [hdul[0].header['PSFCENTX'], hdul[0].header['PSFCENTY']]
+            # Collect the flux retrievals for all companions that were
+            # injected, for all KL modes used. Need to retrieve each KL mode
+            # individually due to pyKLIP subtleties, basically the same as
+            # what pyKLIP would be doing anyway.
+            nklmodes = klipped_data.shape[0]
+            retrieve_args = []
+            for inj_id in current_injected:
+                inj_j = inj_id % Npa 
+                inj_i = (inj_id - inj_j) // Npa 
+                for img_i in range(nklmodes):
+                    retrieve_args += [(klipped_data[img_i],
+                                       klipped_center,
+                                       dataset.output_wcs[0],
+                                       injection_seps[inj_i],
+                                       injection_pas[inj_j],
+                                       retrieve_fwhm,
+                                       injection_fluxes[inj_i])]
+
+            # The retrievals are independent of each other, so they can be
+            # run in parallel.
+            if nproc > 1:
+                with Pool(processes=nproc) as pool:
+                    retrieved = pool.map(retrieve_flux_helper, retrieve_args)
+                    pool.close()
+                    pool.join()
+            else:
+                retrieved = [retrieve_flux_helper(args) for args in retrieve_args]
+            retrieved = np.array(retrieved).reshape(len(current_injected), nklmodes)
+
+            for k, inj_id in enumerate(current_injected):
+                inj_j = inj_id % Npa 
+                inj_i = (inj_id - inj_j) // Npa 
+                retrieved_fluxes = retrieved[k]
+
+                # Flux should never be negative, if it is, assume ~=zero flux retrieved
+                neg_mask = np.where(retrieved_fluxes < 0)
+                retrieved_fluxes[neg_mask]=1e-10 
+
+                # Need to save things to some arrays
+                all_seps += [injection_seps[inj_i]]
+                all_pas += [injection_pas[inj_j]]
+                all_inj_fluxes += [injection_fluxes[inj_i]]
+                all_retr_fluxes += [retrieved_fluxes]
 
             # If a companion has been injected and retrieved at every input position then
             # flag to exit the loop. If not increment the counter and continue.
@@ -2019,3 +2105,138 @@ def inject_and_recover(raw_dataset,
         all_retr_fluxes = all_retr_fluxes[:, np.newaxis]
 
     return all_seps, all_pas, all_inj_fluxes, all_retr_fluxes
+
+@lru_cache(maxsize=8)
+def get_pixel_indices(ny,
+                      nx):
+    """
+    Get the pixel index grids of an image, cached by image shape.
+
+    The returned arrays are shared between calls and are therefore made
+    read-only.
+
+    Parameters
+    ----------
+    ny : int
+        Number of image rows.
+    nx : int
+        Number of image columns.
+
+    Returns
+    -------
+    yy : 2D-array
+        Row index of each pixel.
+    xx : 2D-array
+        Column index of each pixel.
+
+    """
+
+    yy, xx = np.indices((ny, nx), dtype=float)
+    yy.flags.writeable = False
+    xx.flags.writeable = False
+
+    return yy, xx
+
+def meas_contrast_cube(dat,
+                       iwa,
+                       owa,
+                       resolution,
+                       center=None):
+    """
+    Measure the 5-sigma contrast of all frames of a data cube at once.
+
+    This is equivalent to calling pyklip.klip.meas_contrast with
+    low_pass_filter=False on each frame, but the separation grid and the
+    annuli are only computed once and the statistics are evaluated for all
+    frames simultaneously.
+
+    Parameters
+    ----------
+    dat : 3D-array
+        Data cube (e.g., one frame per KL mode), already flux calibrated.
+    iwa : float
+        Inner working angle (pixels).
+    owa : float
+        Outer working angle (pixels).
+    resolution : float
+        Size of a noise resolution element (pixels).
+    center : tuple of two float, optional
+        Location of the star (x, y). If None, defaults to the image size // 2.
+        The default is None.
+
+    Returns
+    -------
+    seps : 1D-array
+        Separations (pixels) at which the contrast was measured.
+    contrast : 2D-array
+        5-sigma contrast for each frame and separation.
+
+    """
+
+    if center is None:
+        starx = dat.shape[2] // 2
+        stary = dat.shape[1] // 2
+    else:
+        starx, stary = center
+
+    # Sample the radial profile at twice the resolution, but don't start
+    # right at the edge of the occulting mask.
+    dr = resolution / 2.
+    numseps = int((owa - iwa) / dr)
+    seps = np.arange(numseps) * dr + iwa + resolution / 2.
+
+    # Compute the separation of each pixel only once.
+    yy, xx = get_pixel_indices(*dat.shape[1:])
+    rr = np.sqrt((xx - starx)**2 + (yy - stary)**2)
+
+    # Measure the noise in an annulus with the width of the resolution element
+    # for all frames simultaneously.
+    contrast = np.full((dat.shape[0], numseps), np.nan)
+    for k, sep in enumerate(seps):
+        annulus = np.where((rr < sep + resolution / 2.) & (rr > sep - resolution / 2.))
+        vals = dat[:, annulus[0], annulus[1]]
+        noise_mean = np.nanmean(vals, axis=1)
+        noise_std = np.nanstd(vals, axis=1, ddof=1)
+
+        # Account for small sample statistics by dividing the number of
+        # non-nan pixels by the approximate size of one resolution element.
+        num_good_pix = np.sum(~np.isnan(vals), axis=1)
+        num_samples = np.floor(num_good_pix / (np.pi * (resolution / 2.)**2)).astype(int)
+
+        # Find the 5-sigma flux using student-t statistics, correction based
+        # on Mawet et al. 2014.
+        good = num_samples != 0
+        contrast[good, k] = student_t.ppf(0.99999971334, num_samples[good] - 1, scale=noise_std[good]) \
+                            * np.sqrt(1. + 1. / num_samples[good]) + noise_mean[good]
+
+    return seps, contrast
+
+def retrieve_flux_helper(args):
+    """
+    Function to unpack parameters for the retrieval of an injected companion
+    flux in multiprocessing.
+
+    Parameters
+    ----------
+    args : tuple
+        Frame, center, WCS, separation (pixels), position angle (degrees),
+        FWHM guess (pixels), and peak flux guess of the injected companion.
+
+    Returns
+    -------
+    retrieved_flux : float
+        Retrieved peak flux of the injected companion.
+
+    """
+
+    frame, center, wcs, sep, pa, fwhm, flux = args
+
+    return fakes.retrieve_planet_flux(frames=frame, 
+                                      centers=center, 
+                                      astr_hdrs=wcs, 
+                                      sep=sep, 
+                                      pa=pa,
+                                      searchrad=5, 
+                                      guessfwhm=fwhm,
+                                      guesspeak=flux, 
+                                      refinefit=True)
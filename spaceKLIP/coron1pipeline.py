@@ -6,6 +6,7 @@ import matplotlib
 # IMPORTS
 # =============================================================================
 
+import copy
 import os
 import pdb
 import sys
@@ -13,6 +14,7 @@ import sys
 import astropy.io.fits as fits
 import numpy as np
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import trange
 
 from jwst.lib import reffile_utils
@@ -22,6 +24,7 @@ from jwst.datamodels import dqflags, RampModel, SaturationModel
 from jwst.pipeline import Detector1Pipeline, Image2Pipeline, Coron3Pipeline
 from .fnoise_clean import kTCSubtractStep, OneOverfStep
 from .expjumpramp import ExperimentalJumpRampStep
+from .logging_tools import all_logging_disabled
 from webbpsf_ext import robust
 
 from scipy.interpolate import interp1d
@@ -33,6 +36,10 @@ log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 
 
+# Sentinel for step parameters that did not exist before being overridden
+_MISSING = object()
+
+
 # =============================================================================
 # MAIN
 # =============================================================================
@@ -52,6 +59,35 @@ class Coron1Pipeline_spaceKLIP(Detector1Pipeline):
     """
     
     class_alias = "calwebb_coron1"
+    
+    # Sequences of steps run before ramp fitting. Names starting with 'do_'
+    # are custom implementations of this class, all others are run as is.
+    _MIRI_STEPS = ('group_scale',
+                   'dq_init',
+                   'saturation',
+                   # 'ipc', Not run for MIRI
+                   'firstframe',
+                   'lastframe',
+                   'reset',
+                   'linearity',
+                   'rscd',
+                   'dark_current',
+                   'refpix',
+                   # 'charge_migration', Not run for MIRI
+                   'jump',
+                   'mask_groups')
+    _NIR_STEPS = ('group_scale',
+                  'dq_init',
+                  'do_saturation',
+                  'ipc',
+                  'superbias',
+                  'do_refpix',
+                  'linearity',
+                  'persistence',
+                  'dark_current',
+                  'charge_migration',
+                  'jump',
+                  'subtract_ktc')
 
     spec = """
         save_intermediates = boolean(default=False) # Save all intermediate step results
@@ -103,6 +139,57 @@ class Coron1Pipeline_spaceKLIP(Detector1Pipeline):
         # NOTE: `save_calibrated_ramp` is already a Detector1Pipeline property
         self.ramp_fit.save_calibrated_ramp = False
         
+        # Original values of step parameters overridden by `set_step_par`
+        self._orig_step_pars = {}
+        
+    
+    def set_step_par(self,
+                     step,
+                     key,
+                     value):
+        """
+        Set a step parameter and remember its original value so that the
+        pipeline instance can be reused for other files.
+        
+        Parameters
+        ----------
+        step : str
+            Name of the pipeline step.
+        key : str
+            Name of the step parameter.
+        value : any
+            New value of the step parameter.
+        
+        Returns
+        -------
+        None.
+        
+        """
+        
+        step_obj = getattr(self, step)
+        if (step, key) not in self._orig_step_pars:
+            self._orig_step_pars[(step, key)] = getattr(step_obj, key, _MISSING)
+        setattr(step_obj, key, value)
+    
+    def restore_step_pars(self):
+        """
+        Restore all step parameters overridden by `set_step_par` to their
+        original values.
+        
+        Returns
+        -------
+        None.
+        
+        """
+        
+        for (step, key), value in self._orig_step_pars.items():
+            step_obj = getattr(self, step)
+            if value is _MISSING:
+                if hasattr(step_obj, key):
+                    delattr(step_obj, key)
+            else:
+                setattr(step_obj, key, value)
+        self._orig_step_pars = {}
     
     def process(self,
                 input):
@@ -122,42 +209,20 @@ class Coron1Pipeline_spaceKLIP(Detector1Pipeline):
         
         """
         
-        # Open input as ramp model.
-        input = RampModel(input)
+        # Open input as ramp model, unless it already is one.
+        if not isinstance(input, RampModel):
+            input = RampModel(input)
         
         # Process MIR & NIR exposures differently.
         instrument = input.meta.instrument.name
-        if instrument == 'MIRI':
-            input = self.run_step(self.group_scale, input)
-            input = self.run_step(self.dq_init, input)
-            input = self.run_step(self.saturation, input)
-            #input = self.run_step(self.ipc, input) Not run for MIRI
-            input = self.run_step(self.firstframe, input)
-            input = self.run_step(self.lastframe, input)
-            input = self.run_step(self.reset, input)
-            input = self.run_step(self.linearity, input)
-            input = self.run_step(self.rscd, input)
-            input = self.run_step(self.dark_current, input)
-            input = self.run_step(self.refpix, input)
-            #input = self.run_step(self.charge_migration, input) Not run for MIRI
-            input = self.run_step(self.jump, input)
-            input = self.run_step(self.mask_groups, input)
-        else:
-            input = self.run_step(self.group_scale, input)
-            input = self.run_step(self.dq_init, input)
-            input = self.do_saturation(input)
-            input = self.run_step(self.ipc, input)
-            input = self.run_step(self.superbias, input)
-            input = self.do_refpix(input)
-            input = self.run_step(self.linearity, input)
-            input = self.run_step(self.persistence, input)
-            input = self.run_step(self.dark_current, input)
-            input = self.run_step(self.charge_migration, input)
-            input = self.run_step(self.jump, input)
-            input = self.run_step(self.subtract_ktc, input)
-            #1overf Only present in NIR data
-            if 'groups' in self.stage_1overf:
-                input = self.run_step(self.subtract_1overf, input)
+        for name in (self._MIRI_STEPS if instrument == 'MIRI' else self._NIR_STEPS):
+            if name.startswith('do_'):
+                input = getattr(self, name)(input)
+            else:
+                input = self.run_step(getattr(self, name), input)
+        #1overf Only present in NIR data
+        if (instrument != 'MIRI') and ('groups' in self.stage_1overf):
+            input = self.run_step(self.subtract_1overf, input)
         
         # save the corrected ramp data, if requested
         if self.ramp_fit.save_calibrated_ramp or self.save_calibrated_ramp or self.save_intermediates:
@@ -275,11 +340,14 @@ class Coron1Pipeline_spaceKLIP(Detector1Pipeline):
             # Saving is unspecified
             really_save_results = False
         
-        # Run step. Don't save results yet.
+        # Run step. Don't save results yet. Only touch the step attribute if
+        # it actually needs to be changed.
         step_save_orig = step_obj.save_results
-        step_obj.save_results = False
+        if step_save_orig:
+            step_obj.save_results = False
         res = step_obj(input)
-        step_obj.save_results = step_save_orig
+        if step_save_orig:
+            step_obj.save_results = step_save_orig
         
         # Check if group scale correction or gain scale correction were skipped.
         if step_obj is self.group_scale:
@@ -292,7 +360,7 @@ class Coron1Pipeline_spaceKLIP(Detector1Pipeline):
         # Save results.
         if really_save_results:
             step_obj.output_dir = self.output_dir
-            if isinstance(res, (tuple)):
+            if type(res) is tuple:
                 self.save_model(res[0], suffix=step_obj.suffix+'0')
                 self.save_model(res[1], suffix=step_obj.suffix+'1')
             else:
@@ -319,7 +387,6 @@ class Coron1Pipeline_spaceKLIP(Detector1Pipeline):
             Output JWST datamodel.
         
         """
-        from .utils import expand_mask
         
         # Save original step parameter.
         npix_grow = self.saturation.n_pix_grow_sat
@@ -328,8 +395,10 @@ class Coron1Pipeline_spaceKLIP(Detector1Pipeline):
         flag_rcsat = self.saturation.flag_rcsat
         if flag_rcsat:
             mask_rc = (input.pixeldq & dqflags.pixel['RC']) > 0
-            # Do a bitwise OR of RC mask with groupdq to flip saturation bits
-            input.groupdq = input.groupdq | (mask_rc * dqflags.pixel['SATURATED'])
+            # Do a bitwise OR of RC mask with groupdq to flip saturation bits,
+            # staying in the native groupdq dtype
+            flag_sat = input.groupdq.dtype.type(dqflags.pixel['SATURATED'])
+            np.bitwise_or(input.groupdq, flag_sat, out=input.groupdq, where=mask_rc)
 
         # Run step with default settings.
         if self.saturation.grow_diagonal or npix_grow == 0:
@@ -342,15 +411,20 @@ class Coron1Pipeline_spaceKLIP(Detector1Pipeline):
             self.saturation.n_pix_grow_sat = npix_grow
 
             self.saturation.log.info(f'Growing saturation flags by {npix_grow} pixels. Ignoring diagonal growth.')
-            # Update saturation dq flags to grow in vertical and horizontal directions
-            # Get saturation mask
-            mask_sat = (res.groupdq & dqflags.pixel['SATURATED']) > 0
+            # Update saturation dq flags to grow in vertical and horizontal directions.
+            # Work on one integration at a time so that the temporary masks stay
+            # small and the groupdq cube is only swept once.
+            flag_sat = res.groupdq.dtype.type(dqflags.pixel['SATURATED'])
+            for groupdq_int in res.groupdq:
+                # Get saturation mask
+                mask_sat = (groupdq_int & flag_sat) > 0
 
-            # Expand the mask by npix_grow pixels
-            mask_sat = expand_mask(mask_sat, npix_grow, grow_diagonal=False)
+                # Expand the mask by npix_grow pixels
+                mask_sat = _grow_mask_cross(mask_sat, npix_grow)
 
-            # Do a bitwise OR of new mask with groupdq to flip saturation bit
-            res.groupdq = res.groupdq | (mask_sat * dqflags.pixel['SATURATED'])
+                # Do an in-place bitwise OR of new mask with groupdq to flip saturation bit,
+                # staying in the native groupdq dtype
+                np.bitwise_or(groupdq_int, flag_sat, out=groupdq_int, where=mask_sat)
 
             # Do the same for the zero frames
             zframes = res.zeroframe if res.meta.exposure.zero_frame else None
@@ -358,7 +432,7 @@ class Coron1Pipeline_spaceKLIP(Detector1Pipeline):
                 # Saturated zero frames have already been set to 0
                 mask_sat = (zframes==0) | mask_rc if flag_rcsat else (zframes==0)
                 # Expand the mask by npix_grow pixels
-                mask_sat = expand_mask(mask_sat, npix_grow, grow_diagonal=False)
+                mask_sat = _grow_mask_cross(mask_sat, npix_grow)
                 # Set saturated pixels to 0 in zero frames
                 res.zeroframe[mask_sat] = 0
 
@@ -495,23 +569,31 @@ class Coron1Pipeline_spaceKLIP(Detector1Pipeline):
         # Update pixel DQ mask to manually set reference pixels
         log.info(f'Flagging [{nlower}, {nupper}] references rows at [bottom, top] of array')
         log.info(f'Flagging [{nleft}, {nright}] references rows at [left, right] of array')
-        pixeldq_orig = input.pixeldq.copy()
+        refpix_slices = []
         if nlower>0:
             ib1 = nrow_off
             ib2 = ib1 + nlower
-            input.pixeldq[ib1:ib2,:] = input.pixeldq[ib1:ib2,:]  | dqflags.pixel['REFERENCE_PIXEL']
+            refpix_slices += [np.s_[ib1:ib2,:]]
         if nupper>0:
             it1 = -1 * (nupper + nrow_off)
             it2 = None if nrow_off == 0 else -1 * nrow_off
-            input.pixeldq[it1:it2,:] = input.pixeldq[it1:it2,:] | dqflags.pixel['REFERENCE_PIXEL']
+            refpix_slices += [np.s_[it1:it2,:]]
         if nleft>0:
             il1 = ncol_off
             il2 = il1 + nleft
-            input.pixeldq[:,il1:il2] = input.pixeldq[:,il1:il2] | dqflags.pixel['REFERENCE_PIXEL']
+            refpix_slices += [np.s_[:,il1:il2]]
         if nright>0:
             ir1 = -1 * (nright + ncol_off)
             ir2 = None if ncol_off == 0 else -1 * ncol_off
-            input.pixeldq[:,ir1:ir2] = input.pixeldq[:,ir1:ir2] | dqflags.pixel['REFERENCE_PIXEL']
+            refpix_slices += [np.s_[:,ir1:ir2]]
+        
+        # Only keep a copy of the original flags of the edge rows & columns and
+        # flag them in-place in the native pixeldq dtype.
+        pixeldq_orig = [input.pixeldq[sl].copy() for sl in refpix_slices]
+        flag_ref = input.pixeldq.dtype.type(dqflags.pixel['REFERENCE_PIXEL'])
+        for sl in refpix_slices:
+            temp = input.pixeldq[sl]
+            np.bitwise_or(temp, flag_ref, out=temp)
 
         # Turn off side reference pixels?
         use_side_orig = self.refpix.use_side_ref_pixels 
@@ -526,18 +608,70 @@ class Coron1Pipeline_spaceKLIP(Detector1Pipeline):
         
         # Unflag custom reference pixel rows & columns.
         self.refpix.log.info('Removing custom reference pixel flags')
-        if nlower>0:
-            res.pixeldq[ib1:ib2,:] = pixeldq_orig[ib1:ib2,:]
-        if nupper>0:
-            res.pixeldq[it1:it2,:] = pixeldq_orig[it1:it2,:]
-        if nleft>0:
-            res.pixeldq[:,il1:il2] = pixeldq_orig[:,il1:il2]
-        if nright>0:
-            res.pixeldq[:,ir1:ir2] = pixeldq_orig[:,ir1:ir2]
+        for sl, temp in zip(refpix_slices, pixeldq_orig):
+            res.pixeldq[sl] = temp
 
         return res
 
-def run_single_file(fitspath, output_dir, steps={}, verbose=False, **kwargs):
+def _grow_mask_cross(mask, npix):
+    """
+    Grow a boolean mask by npix pixels in the vertical and horizontal
+    directions (no diagonals) along its last two axes.
+    
+    Equivalent to `webbpsf_ext.image_manip.expand_mask` with
+    grow_diagonal=False, but operates on the whole array at once by OR-ing
+    shifted slices instead of dilating image by image.
+    
+    Parameters
+    ----------
+    mask : ndarray
+        Boolean mask with 2 or more dimensions.
+    npix : int
+        Number of pixels to grow the mask by.
+    
+    Returns
+    -------
+    grown : ndarray
+        Grown boolean mask.
+    
+    """
+    
+    grown = mask.copy()
+    for i in range(npix):
+        temp = grown.copy()
+        grown[..., 1:, :] |= temp[..., :-1, :]
+        grown[..., :-1, :] |= temp[..., 1:, :]
+        grown[..., :, 1:] |= temp[..., :, :-1]
+        grown[..., :, :-1] |= temp[..., :, 1:]
+    
+    return grown
+
+def _init_pipeline(output_dir, verbose=False):
+    """
+    Initialize a spaceKLIP JWST stage 1 pipeline instance.
+    
+    Parameters
+    ----------
+    output_dir : str
+        Path to the output directory to save the resulting data products.
+    verbose : bool, optional
+        Print all info messages during initialization? Default is False.
+    
+    Returns
+    -------
+    pipeline : Coron1Pipeline_spaceKLIP
+        New pipeline instance.
+    
+    """
+    
+    # Print all info message if verbose, otherwise only errors or critical.
+    log_level = logging.INFO if verbose else logging.ERROR
+    with all_logging_disabled(log_level):
+        pipeline = Coron1Pipeline_spaceKLIP(output_dir=output_dir)
+    
+    return pipeline
+
+def run_single_file(fitspath, output_dir, steps={}, verbose=False, pipeline=None, **kwargs):
     """ Run the JWST stage 1 detector pipeline on a single file.
     
     WARNING: Will overwrite exiting files.
@@ -592,6 +726,14 @@ def run_single_file(fitspath, output_dir, steps={}, verbose=False, **kwargs):
             'none', 'quarter', 'half', or 'all'. Default: 'quarter'.
 
         The default is {}. 
+    verbose : bool, optional
+        Print all info messages? Default is False.
+    pipeline : Coron1Pipeline_spaceKLIP, optional
+        Pipeline instance to reuse, e.g., from a previous call, which avoids
+        the overhead of initializing a new pipeline for every file. Step
+        parameters set from a previous `steps` dictionary are reverted
+        before the new ones are applied. If None, a new instance is
+        created. The default is None.
     
     Keyword Args
     ------------
@@ -646,16 +788,18 @@ def run_single_file(fitspath, output_dir, steps={}, verbose=False, **kwargs):
     from webbpsf_ext.analysis_tools import nrc_ref_info
 
     # Print all info message if verbose, otherwise only errors or critical.
-    from .logging_tools import all_logging_disabled
     log_level = logging.INFO if verbose else logging.ERROR
 
     # Create output directory if it doesn't exist.
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # Initialize Coron1Pipeline.
-    with all_logging_disabled(log_level):
-        pipeline = Coron1Pipeline_spaceKLIP(output_dir=output_dir)
+    # Initialize Coron1Pipeline or reuse the provided instance.
+    if pipeline is None:
+        pipeline = _init_pipeline(output_dir, verbose=verbose)
+    else:
+        pipeline.output_dir = output_dir
+        pipeline.restore_step_pars()
 
     # Options for saving results
     pipeline.save_results         = kwargs.get('save_results', True)
@@ -719,13 +863,13 @@ def run_single_file(fitspath, output_dir, steps={}, verbose=False, **kwargs):
     # Set parameters from step dictionary
     for key1 in steps.keys():
         for key2 in steps[key1].keys():
-            setattr(getattr(pipeline, key1), key2, steps[key1][key2])
+            pipeline.set_step_par(key1, key2, steps[key1][key2])
 
     #Override jump & ramp if necessary
     if pipeline.experimental_jumpramp.use:
         log.info("Experimental jump/ramp fitting selected, regular jump and ramp will be skipped...")
-        pipeline.jump.skip = True
-        pipeline.ramp_fit.skip = True
+        pipeline.set_step_par('jump', 'skip', True)
+        pipeline.set_step_par('ramp_fit', 'skip', True)
     
     # Run Coron1Pipeline. Raise exception on error.
     # Ensure that pipeline is closed out.
@@ -749,12 +893,32 @@ def run_single_file(fitspath, output_dir, steps={}, verbose=False, **kwargs):
 
     return res
 
+def run_single_file_helper(args):
+    """ Helper function for running `run_single_file` in multiple processes
+    
+    The `args` parameter should be a tuple consisting of:
+    (fitspath, output_dir, steps, verbose, kwargs)
+    
+    Ramp fitting is restricted to a single core to avoid oversubscribing
+    the processors. Nothing is returned to avoid pickling the output
+    datamodel.
+    """
+
+    fitspath, output_dir, steps, verbose, kwargs = args
+
+    kwargs = dict(kwargs, maximum_cores='none')
+    if 'ramp_fit' in steps and 'maximum_cores' in steps['ramp_fit']:
+        steps = dict(steps, ramp_fit=dict(steps['ramp_fit'], maximum_cores='none'))
+
+    _ = run_single_file(fitspath, output_dir, steps=steps, verbose=verbose, **kwargs)
+
 def run_obs(database,
             steps={},
             subdir='stage1',
             overwrite=True,
             quiet=False,
             verbose=False,
+            nproc=1,
             **kwargs):
     """
     Run the JWST stage 1 detector pipeline on the input observations database.
@@ -817,6 +981,10 @@ def run_obs(database,
         Overrides verbose and sets it to False. Default is False.
     verbose : bool, optional
         Print all info messages? Default is False.
+    nproc : int, optional
+        Number of processes used to run the pipeline on the FITS files of
+        each concatenation in parallel. Each process runs one file at a time
+        with ramp fitting restricted to a single core. The default is 1.
     
     Keyword Args
     ------------
@@ -882,6 +1050,9 @@ def run_obs(database,
     else:
         itervals = range(nkeys)
 
+    # A single pipeline instance is reused for all files processed serially.
+    pipeline = None
+    
     groupmaskflag = 0 # Set flag for group masking
     skip_revert = False # Set flag for skipping a file
     # Loop through concatenations.
@@ -889,7 +1060,10 @@ def run_obs(database,
         key = keys[i]
         if not quiet: log.info('--> Concatenation ' + key)
 
-        # Loop through FITS files.
+        # Loop through FITS files. If running in parallel, collect the
+        # pipeline arguments and update the database for these files as
+        # each of them finishes processing.
+        run_args = []
         nfitsfiles = len(database.obs[key])
         jtervals = trange(nfitsfiles, desc='FITS files', leave=False) if quiet else range(nfitsfiles)
         for j in jtervals:
@@ -955,8 +1129,16 @@ def run_obs(database,
                                         + tail)
             else:
                 if not quiet: log.info('  --> Coron1Pipeline: processing ' + tail)
-                _ = run_single_file(fitspath, output_dir, steps=steps, 
-                                    verbose=verbose, **kwargs)
+                if nproc > 1:
+                    # The steps dictionary is modified for later files, so
+                    # each process needs its own copy.
+                    run_args += [(j, fitsout_path, (fitspath, output_dir, copy.deepcopy(steps), verbose, kwargs))]
+                else:
+                    if pipeline is None:
+                        pipeline = _init_pipeline(output_dir, verbose=verbose)
+                    _ = run_single_file(fitspath, output_dir, steps=steps, 
+                                        verbose=verbose, pipeline=pipeline, 
+                                        **kwargs)
 
             if skip_revert:
                 # Need to make sure we don't skip later files if we just didn't want to mask_groups for this file
@@ -976,8 +1158,34 @@ def run_obs(database,
                     del steps['mask_groups']['maxgrps_bright']
 
             
-            # Update spaceKLIP database.
-            database.update_obs(key, j, fitsout_path)
+            # Update spaceKLIP database. Files that still need to be
+            # processed in parallel are updated once they have finished.
+            if len(run_args) == 0 or run_args[-1][0] != j:
+                database.update_obs(key, j, fitsout_path)
+        
+        # The FITS files are independent of each other, so they can be
+        # processed in parallel. Update the database as each file finishes
+        # so that partial progress is recorded like in the serial case.
+        if len(run_args) > 0:
+            failed = []
+            with ProcessPoolExecutor(max_workers=min(nproc, len(run_args))) as executor:
+                futures = {executor.submit(run_single_file_helper, args): (j, fitsout_path)
+                           for j, fitsout_path, args in run_args}
+                for future in as_completed(futures):
+                    j, fitsout_path = futures[future]
+                    tail = os.path.split(database.obs[key]['FITSFILE'][j])[1]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        log.error('  --> Coron1Pipeline: failed to process ' + tail
+                                  + '\nException: {}'.format(e))
+                        failed += [tail]
+                        continue
+                    database.update_obs(key, j, fitsout_path)
+            if len(failed) > 0:
+                raise RuntimeError(
+                    'Caught exception during pipeline processing of {}.'.format(', '.join(failed))
+                )
 
 def prepare_group_masking_basic(steps, observations, quiet=False):
 
@@ -146,35 +146,37 @@ class ExperimentalJumpRampStep(Step):
         # Define array to flag which diff frames to use
         all_diffs2use = self.create_alldiffs2use(datamodel, diffs.shape)
 
-        # Loop over each integration, run one ramp at a time
-        for int_i in range(nints):
-            print('--> Fitting Integration {}/{}...'.format(int_i+1, nints))
-            
-            # Get the diffs for this integration
-            int_diffs = diffs[int_i]
+        # Loop over each integration, run one ramp at a time. A single pool is
+        # shared by all integrations, and each task is only sent the column
+        # of pixels it works on instead of the whole integration.
+        with Pool(processes=self.nproc) as pool:
+            for int_i in range(nints):
+                print('--> Fitting Integration {}/{}...'.format(int_i+1, nints))
+                
+                # Get the diffs for this integration
+                int_diffs = diffs[int_i]
 
-            # Get array to save which differences we will use
-            int_diffs2use = all_diffs2use[int_i]
+                # Get array to save which differences we will use
+                int_diffs2use = all_diffs2use[int_i]
 
-            # Now loop over each column using multiprocessing
-            colrange = range(ncols)
-            with Pool(processes=self.nproc) as pool:
-                results = pool.map(jumpramp_column_helper, [(i, 
-                                                             int_diffs, 
+                # Now loop over each column using multiprocessing
+                colrange = range(ncols)
+                results = pool.map(jumpramp_column_helper, [(0, 
+                                                             int_diffs[:, :, i:i+1], 
                                                              C, 
-                                                             sig, 
-                                                             int_diffs2use) for i in colrange])
-                pool.close()
-                pool.join()
-
-            # Unpack results into the arrays
-            for i, res in enumerate(results):
-                res_rate, res_uncert, res_poisson, res_rdnoise, int_diffs2use = res
-                rate_ints[int_i, :, i] = res_rate
-                uncert_ints[int_i, :, i] = res_uncert
-                var_po_ints[int_i, :, i] = res_poisson
-                var_rd_ints[int_i, :, i] = res_rdnoise
-                all_diffs2use[int_i, :, :, i] = int_diffs2use
+                                                             sig[:, i:i+1], 
+                                                             int_diffs2use[:, :, i:i+1]) for i in colrange])
+
+                # Unpack results into the arrays
+                for i, res in enumerate(results):
+                    res_rate, res_uncert, res_poisson, res_rdnoise, int_diffs2use = res
+                    rate_ints[int_i, :, i] = res_rate
+                    uncert_ints[int_i, :, i] = res_uncert
+                    var_po_ints[int_i, :, i] = res_poisson
+                    var_rd_ints[int_i, :, i] = res_rdnoise
+                    all_diffs2use[int_i, :, :, i] = int_diffs2use
+            pool.close()
+            pool.join()
 
         # Explictly remove the gain scaling
         rate_ints /= gain
@@ -388,6 +388,21 @@ def display_coron_dataset(database, restrict_to=None, save_filename=None, stage3
         pdf.close()
 
 @plt.style.context('spaceKLIP.sk_style')
+def _log_norm(img):
+    """
+    Logarithmic color normalization of an absolute-valued image between
+    its 1st percentile and its maximum.
+    
+    Only strictly positive pixels are considered, so that masked or padded
+    zeros do not produce an invalid vmin of 0.
+    """
+    
+    pos = img[img > 0]
+    if pos.size == 0:
+        return matplotlib.colors.LogNorm()
+    
+    return matplotlib.colors.LogNorm(vmin=np.percentile(pos, 1), vmax=np.max(pos))
+
 def plot_contrast_images(meta, data, data_masked, pxsc=None, savefile='./maskimage.pdf'):
     """
     Plot subtracted images to be used for contrast estimation, one with
@@ -410,7 +425,11 @@ def plot_contrast_images(meta, data, data_masked, pxsc=None, savefile='./maskima
     f, ax = plt.subplots(1, 2, figsize=(2*6.4, 1*4.8))
 
     # Plot subtracted image, circle input companion locations
-    ax[0].imshow(np.log10(np.abs(data[-1])), origin='lower', cmap='inferno', extent=extent)
+    # Let matplotlib handle the logarithmic stretch instead of computing
+    # log10 images for display.
+    img = np.abs(data[-1])
+    norm = _log_norm(img)
+    ax[0].imshow(img, origin='lower', cmap='inferno', norm=norm, extent=extent)
     for j in range(len(meta.ra_off)):
         cc = plt.Circle((meta.ra_off[j]/1000., meta.de_off[j]/1000.), 10.*pxsc/1000., fill=False, edgecolor='green', linewidth=3)
         ax[0].add_artist(cc)
@@ -424,7 +443,9 @@ def plot_contrast_images(meta, data, data_masked, pxsc=None, savefile='./maskima
     ax[0].set_title('KLIP-subtracted')
 
     # Plot subtracted image, with adopted masking
-    ax[1].imshow(np.log10(np.abs(data_masked[-1])), origin='lower', cmap='inferno', extent=extent)
+    img = np.abs(data_masked[-1])
+    norm = _log_norm(img)
+    ax[1].imshow(img, origin='lower', cmap='inferno', norm=norm, extent=extent)
     ax[1].set_xlabel(xlabel)
     ax[1].set_ylabel(ylabel)
     if 'SWB' in savefile or 'LWB' in savefile:
@@ -501,15 +522,20 @@ def plot_injected_locs(meta, data, transmission, seps, pas, pxsc=None, savefile=
 
         xlabel, ylabel = '$\Delta$RA [arcsec]', '$\Delta$DEC [arcsec]'
 
+    # Convert the injected locations to offsets once for both panels.
+    pa_rad = np.deg2rad(pas)
+    ra_arr = np.asarray(seps)*pxsc*np.sin(pa_rad) # mas
+    de_arr = np.asarray(seps)*pxsc*np.cos(pa_rad) # mas
+
     f, ax = plt.subplots(1, 2, figsize=(2*6.4, 1*4.8))
-    ax[0].imshow(np.log10(np.abs(data)), origin='lower', cmap='inferno', extent=extent)
+    img = np.abs(data)
+    norm = _log_norm(img)
+    ax[0].imshow(img, origin='lower', cmap='inferno', norm=norm, extent=extent)
     for i in range(len(meta.ra_off)):
         cc = plt.Circle((meta.ra_off[i]/1000., meta.de_off[i]/1000.), 10.*pxsc/1000., fill=False, edgecolor='green', linewidth=3)
         ax[0].add_artist(cc)
     for i in range(len(seps)):
-        ra = seps[i]*pxsc*np.sin(np.deg2rad(pas[i])) # mas
-        de = seps[i]*pxsc*np.cos(np.deg2rad(pas[i])) # mas
-        cc = plt.Circle((ra/1000., de/1000.), 10.*pxsc/1000., fill=False, edgecolor='red', linewidth=3)
+        cc = plt.Circle((ra_arr[i]/1000., de_arr[i]/1000.), 10.*pxsc/1000., fill=False, edgecolor='red', linewidth=3)
         ax[0].add_artist(cc)
     # ax[0].set_xlim([5., -5.])
     # ax[0].set_ylim([-5., 5.])
@@ -526,9 +552,7 @@ def plot_injected_locs(meta, data, transmission, seps, pas, pxsc=None, savefile=
         cc = plt.Circle((meta.ra_off[i]/1000., meta.de_off[i]/1000.), 10.*pxsc/1000., fill=False, edgecolor='green', linewidth=3)
         ax[1].add_artist(cc)
     for i in range(len(seps)):
-        ra = seps[i]*pxsc*np.sin(np.deg2rad(pas[i])) # mas
-        de = seps[i]*pxsc*np.cos(np.deg2rad(pas[i])) # mas
-        cc = plt.Circle((ra/1000., de/1000.), 10.*pxsc/1000., fill=False, edgecolor='red', linewidth=3)
+        cc = plt.Circle((ra_arr[i]/1000., de_arr[i]/1000.), 10.*pxsc/1000., fill=False, edgecolor='red', linewidth=3)
         ax[1].add_artist(cc)
     # ax[1].set_xlim([5., -5.])
     # ax[1].set_ylim([-5., 5.])
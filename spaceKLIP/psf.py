@@ -13,21 +13,32 @@ import sys
 import astropy.io.fits as pyfits
 import numpy as np
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import webbpsf, webbpsf_ext
 from webbpsf_ext import synphot_ext as S
 
 from pyklip.klip import rotate as nanrotate
-from scipy.ndimage import rotate
+from scipy import fft as sp_fft
+from scipy.ndimage import fourier_shift, rotate, spline_filter
 from scipy.ndimage import shift as spline_shift
+from scipy.interpolate import interp1d
 from scipy.optimize import minimize
 
 from tqdm.auto import tqdm
 
+try:
+    import cv2
+    OPENCV_EXISTS = True
+except ImportError:
+    OPENCV_EXISTS = False
+
 from webbpsf_ext import NIRCam_ext, MIRI_ext
 from webbpsf_ext.utils import siaf_nrc, siaf_mir
 
 from webbpsf_ext.coords import rtheta_to_xy
-from webbpsf_ext.image_manip import fourier_imshift, frebin, pad_or_cut_to_size
+from webbpsf_ext.image_manip import frebin, pad_or_cut_to_size
 from webbpsf_ext.image_manip import add_ipc, add_ppc
 from webbpsf_ext.imreg_tools import get_coron_apname as gen_nrc_coron_apname
 from webbpsf_ext.imreg_tools import crop_image, apply_pixel_diffusion
@@ -37,6 +48,9 @@ import logging
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 
+# Model PSFs generated by gen_offsetpsf, keyed by the observing setup.
+_offsetpsf_cache = {}
+
 
 # =============================================================================
 # MAIN
@@ -99,12 +113,15 @@ class JWST_PSF():
         
         """
 
+        # Use the SIAF objects cached by webbpsf_ext for aperture lookups
         if apername in siaf_nrc.apernames:
             inst = 'NIRCAM'
             self.inst_ext = NIRCam_ext
+            siaf = siaf_nrc
         elif apername in siaf_mir.apernames:
             inst = 'MIRI'
             self.inst_ext = MIRI_ext
+            siaf = siaf_mir
         else:
             raise ValueError("apername not found in NIRCam or MIRI SIAF lists")
                 
@@ -158,7 +175,7 @@ class JWST_PSF():
         setup_logging('WARN', verbose=False)
         inst_on = self.inst_ext(filter=filt, image_mask=image_mask, pupil_mask=pupil_mask,
                                 fov_pix=fov_pix, oversample=oversample, **kwargs)
-        inst_on.siaf_ap = inst_on.siaf[apername]
+        inst_on.siaf_ap = siaf[apername]
         # Is this a TA aperture on the ND mask?
         if inst=='NIRCAM':
             inst_on.ND_acq = ND_acq
@@ -185,10 +202,6 @@ class JWST_PSF():
                 inst_on.gen_wfemask_coeff(large_grid=True)
             func_on = inst_on.calc_psf_from_coeff
             func_off = inst_off.calc_psf_from_coeff
-            func_off = inst_off.calc_psf_from_coeff
-            inst_on.gen_wfemask_coeff(large_grid=True)
-            func_off = inst_off.calc_psf_from_coeff                
-            inst_on.gen_wfemask_coeff(large_grid=True)
         else:
             func_on = inst_on.calc_psf
             func_off = inst_off.calc_psf
@@ -203,30 +216,60 @@ class JWST_PSF():
             sp = _sp_to_spext(sp, **kwargs)
             sp = sp.renorm(1, 'counts', inst_on.bandpass)
         
-        # On axis PSF
+        # The off-axis PSF is independent of the on-axis PSFs, so compute it
+        # in a separate thread while the on-axis PSFs are generated. This is
+        # only safe if the two use separate instrument instances and evaluate
+        # coefficient models; webbpsf calculations are not thread safe.
         log.info('Generating on-axis and off-axis PSFs...')
-        if image_mask[-1] == 'B':
-            # Information for bar offsetting (in arcsec)
-            bar_offset = inst_on.get_bar_offset(ignore_options=True)
-            bar_offset = 0 if bar_offset is None else bar_offset
+        executor = None
+        if use_coeff and (inst_off is not inst_on):
+            executor = ThreadPoolExecutor(max_workers=1)
+            future_off = executor.submit(func_off, sp=sp, return_oversample=True, return_hdul=False)
+        
+        # Make sure that the executor is shut down even if the on-axis PSF
+        # generation fails.
+        try:
+            # On axis PSF
+            if image_mask[-1] == 'B':
+                # Information for bar offsetting (in arcsec)
+                bar_offset = inst_on.get_bar_offset(ignore_options=True)
+                bar_offset = 0 if bar_offset is None else bar_offset
 
-            # Need an array of PSFs along bar center
-            xvals = np.linspace(-8,8,9) - bar_offset
-            self.psf_bar_xvals = xvals
+                # Need an array of PSFs along bar center
+                xvals = np.linspace(-8,8,9) - bar_offset
+                self.psf_bar_xvals = xvals
             
-            psf_bar_arr = []
-            for xv in tqdm(xvals, desc='Bar PSFs', leave=False):
-                psf = func_on(sp=sp, return_oversample=True, return_hdul=False, 
-                              coord_vals=(xv,0), coord_frame='idl')
-                psf_bar_arr.append(psf)
-            self.psf_on = np.array(psf_bar_arr)
-        else:
-            self.psf_on = func_on(sp=sp, return_oversample=True, return_hdul=False)
+                if use_coeff:
+                    # Coefficient-based PSFs can be evaluated for all positions
+                    # along the bar in a single call
+                    psf_bar_arr = func_on(sp=sp, return_oversample=True, return_hdul=False, 
+                                          coord_vals=(xvals, np.zeros_like(xvals)), coord_frame='idl',
+                                          break_iter=False)
+                else:
+                    psf_bar_arr = []
+                    for xv in tqdm(xvals, desc='Bar PSFs', leave=False):
+                        psf = func_on(sp=sp, return_oversample=True, return_hdul=False, 
+                                      coord_vals=(xv,0), coord_frame='idl')
+                        psf_bar_arr.append(psf)
+                self.psf_on = np.array(psf_bar_arr)
+            else:
+                self.psf_on = func_on(sp=sp, return_oversample=True, return_hdul=False)
         
-        # Off axis PSF
-        self.psf_off = func_off(sp=sp, return_oversample=True, return_hdul=False)
+            # Off axis PSF
+            if executor is None:
+                self.psf_off = func_off(sp=sp, return_oversample=True, return_hdul=False)
+            else:
+                self.psf_off = future_off.result()
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
         log.info('  Done.')
         
+        # Single precision is sufficient for the normalized PSFs and halves
+        # the memory traffic of all later shifts and combinations
+        self.psf_on = self.psf_on.astype(np.float32, copy=False)
+        self.psf_off = self.psf_off.astype(np.float32, copy=False)
+        
         # Center PSFs
         self._recenter_psfs()
         
@@ -240,6 +283,9 @@ class JWST_PSF():
         self._func_off = func_off
         
         self.sp = sp
+        
+        # Cache of mask transmissions for previously requested coordinates
+        self._trans_cache = {}
     
     @property
     def fov_pix(self):
@@ -268,7 +314,7 @@ class JWST_PSF():
     
     def _calc_psf_off_shift(self, xysub=10):
         """
-        Calculate oversampled pixel shifts using off-axis PSF and Gaussian
+        Calculate oversampled pixel shifts using off-axis PSF and quadratic
         centroiding.
         
         Returns
@@ -277,33 +323,42 @@ class JWST_PSF():
         
         """
         
-        from astropy.modeling import models, fitting
+        from photutils.centroids import centroid_quadratic
         
         xv = yv = np.arange(xysub)
-        xgrid, ygrid = np.meshgrid(xv, yv)
         xc, yc = (xv.mean(), yv.mean())
         
-        psf_template = pad_or_cut_to_size(self.psf_off, xysub+10)
+        # Crop centered sub-images by slicing (same centering convention as
+        # pad_or_cut_to_size)
+        def crop_center(image, size):
+            ny, nx = image.shape[-2:]
+            if ny < size or nx < size:
+                return pad_or_cut_to_size(image, size)
+            y0 = int((ny - size) / 2 + 0.5)
+            x0 = int((nx - size) / 2 + 0.5)
+            return image[..., y0:y0+size, x0:x0+size]
+        
+        psf_template = crop_center(self.psf_off, xysub+10)
         
         xoff = 0
         yoff = 0
-        for ii in range(2):
-            psf_off = pad_or_cut_to_size(psf_template, xysub)
+        niter = 2
+        for ii in range(niter):
+            psf_off = crop_center(psf_template, xysub)
             
-            # Fit the data using astropy.modeling
-            p_init = models.Gaussian2D(amplitude=psf_off.max(), x_mean=xc, y_mean=yc, x_stddev=1, y_stddev=2)
-            fit_p = fitting.LevMarLSQFitter()
-            
-            pfit = fit_p(p_init, xgrid, ygrid, psf_off)
-            xcen_psf = xc - pfit.x_mean.value
-            ycen_psf = yc - pfit.y_mean.value
+            # Fit a 2D quadratic to the pixels around the PSF peak
+            xc_fit, yc_fit = centroid_quadratic(psf_off, fit_boxsize=5)
+            xcen_psf = xc - xc_fit
+            ycen_psf = yc - yc_fit
             
             # Accumulate offsets
             xoff += xcen_psf
             yoff += ycen_psf
             
-            # Update initial PSF location
-            psf_template = fourier_imshift(psf_template, xcen_psf, ycen_psf, pad=True)
+            # Update initial PSF location. The template is not used anymore
+            # after the last iteration, so skip its shift.
+            if ii < niter - 1:
+                psf_template = _fourier_imshift(psf_template, xcen_psf, ycen_psf, pad=True)
         
         # Save to attribute
         self._xy_off_to_cen_osamp = (xoff, yoff)
@@ -324,8 +379,9 @@ class JWST_PSF():
         xoff, yoff = self._xy_off_to_cen_osamp
         
         # Perform recentering
-        self.psf_on = fourier_imshift(self.psf_on, xoff, yoff, pad=True)
-        self.psf_off = fourier_imshift(self.psf_off, xoff, yoff, pad=True)
+        self.psf_on = _fourier_imshift(self.psf_on, xoff, yoff, pad=True)
+        self.psf_off = _fourier_imshift(self.psf_off, xoff, yoff, pad=True)
+        self._update_bar_interp()
     
     def _shift_psfs(self, shifts):
         """
@@ -345,11 +401,28 @@ class JWST_PSF():
         xoff,yoff = shifts
         
         # Perform the shift
-        self.psf_on = fourier_imshift(self.psf_on, xoff, yoff, pad=True)
-        self.psf_off = fourier_imshift(self.psf_off, xoff, yoff, pad=True)
+        self.psf_on = _fourier_imshift(self.psf_on, xoff, yoff, pad=True)
+        self.psf_off = _fourier_imshift(self.psf_off, xoff, yoff, pad=True)
+        self._update_bar_interp()
         self.xoff = xoff
         self.yoff = yoff
     
+    def _update_bar_interp(self):
+        """
+        Build the interpolation function of the on-axis PSFs along the bar
+        center. Needs to be called whenever the on-axis PSFs change.
+        
+        Returns
+        -------
+        None.
+        
+        """
+        
+        if hasattr(self, 'psf_bar_xvals'):
+            self._bar_interp = interp1d(self.psf_bar_xvals, self.psf_on, kind='linear', 
+                                        fill_value='extrapolate', axis=0, 
+                                        assume_sorted=True)
+    
     def rth_to_xy(self, r, th, PA_V3=0, frame_out='idl', addV3Yidl=True):
         """
         Convert (r,th) location to (x,y) in idl coords.
@@ -439,8 +512,6 @@ class JWST_PSF():
         
         """
         
-        from scipy.interpolate import interp1d
-        
         # Work with oversampled pixels and downsample at end
         siaf_ap = self.inst_on.siaf_ap
         osamp = self.inst_on.oversample
@@ -458,27 +529,33 @@ class JWST_PSF():
             bar_offset = inst_on.get_bar_offset(ignore_options=True)
             bar_offset = 0 if bar_offset is None else bar_offset
 
-            # cx and cy are transformed coordinate relative to center of mask in arcsec
-            trans, cx, cy = inst_on.gen_mask_transmission_map(coord_vals, coord_frame, return_more=True)
+            # cx and cy are transformed coordinate relative to center of mask in arcsec.
+            # These only depend on the requested coordinates, so cache them.
+            coord_arr = np.asarray(coord_vals, dtype=float)
+            trans_key = (coord_frame, coord_arr.shape, coord_arr.tobytes())
+            if trans_key not in self._trans_cache:
+                if len(self._trans_cache) >= 4096:
+                    self._trans_cache.clear()
+                self._trans_cache[trans_key] = inst_on.gen_mask_transmission_map(coord_vals, coord_frame, return_more=True)
+            trans, cx, cy = self._trans_cache[trans_key]
             cx_idl = cx - bar_offset
 
             # Linear combination of min/max to determine PSF
-            # Get a and b values for each position
+            # Get a values for each position
             avals = trans
-            bvals = 1 - avals
             
             if self.image_mask[-1]=='B':
-                # Interpolation function
-                xvals = self.psf_bar_xvals
-                psf_arr = self.psf_on
-                finterp = interp1d(xvals, psf_arr, kind='linear', fill_value='extrapolate', axis=0)
-                psf_on = finterp(cx_idl)
+                # Interpolation function, built whenever the PSFs change
+                psf_on = self._bar_interp(cx_idl)
             else:
                 psf_on = self.psf_on
             psf_off = self.psf_off
             
-            psfs = avals.reshape([-1,1,1]) * psf_off.reshape([1,ny,nx]) \
-                 + bvals.reshape([-1,1,1]) * psf_on.reshape([1,ny,nx])
+            # a * psf_off + (1 - a) * psf_on, written as psf_on + a * (psf_off - psf_on)
+            # so that only one full-size temporary is allocated
+            psf_on = psf_on.reshape([-1,ny,nx])
+            psfs = avals.reshape([-1,1,1]) * (psf_off.reshape([1,ny,nx]) - psf_on)
+            psfs += psf_on
         
         else:
             calc_psf = self._func_on
@@ -492,7 +569,7 @@ class JWST_PSF():
             # Perform shift to center
             # Already done for quick case
             xoff, yoff = self._xy_off_to_cen_osamp
-            psfs = fourier_imshift(psfs, xoff, yoff, pad=True)
+            psfs = _fourier_imshift(psfs, xoff, yoff, pad=True)
         
         if do_shift:
             # Get offset in idl frame
@@ -505,20 +582,18 @@ class JWST_PSF():
             dx_pix = np.array([osamp * xidl / siaf_ap.XSciScale]).ravel()
             dy_pix = np.array([osamp * yidl / siaf_ap.YSciScale]).ravel()
             
-            psfs_sh = []
-            for i, im in enumerate(psfs):
-                psf = fourier_imshift(im, dx_pix[i], dy_pix[i], pad=True)
-                psfs_sh.append(psf)
-            psfs = np.asarray(psfs_sh)
+            # Shift all PSFs at once
+            psfs = _fourier_imshift(psfs, dx_pix, dy_pix, pad=True)
         
         # Resample to detector pixels?
         if not return_oversample:
-            psfs = frebin(psfs, scale=1/osamp)
+            psfs = _rebin_psf(psfs, osamp)
         
         return psfs.squeeze()
     
     def gen_psf(self, loc, mode='xy', PA_V3=0, return_oversample=False, 
-                do_shift=True, addV3Yidl=True, normalize='first', **kwargs):
+                do_shift=True, addV3Yidl=True, normalize='first', rot_order=3,
+                rot_method='scipy', **kwargs):
         """
         Generate offset PSF rotated by PA to N-E orientation.
         
@@ -544,6 +619,22 @@ class JWST_PSF():
                 * 'first': Normalize to 1.0 at entrance pupil
                 * 'exit_pupil': Normalize to 1.0 at exit pupil
             Only works for `quick=False`.
+        rot_order : int
+            Spline interpolation order used to rotate the PSF to the N-E
+            orientation. Default is 3 (cubic). Use 1 (bilinear) for a several
+            times faster rotation of the oversampled PSF at the cost of a
+            slight smoothing.
+        rot_method : str
+            Library used for the rotation to the N-E orientation. Options are:
+                * 'scipy': `scipy.ndimage.rotate` with spline interpolation
+                * 'opencv': `cv2.warpAffine`, several times faster. Uses cubic
+                  convolution (rot_order=3), bilinear (rot_order=1) or
+                  nearest-neighbor (rot_order=0) interpolation; other orders
+                  raise a ValueError. Cubic convolution is not a spline, so
+                  results differ from 'scipy' by up to a few percent of the
+                  peak (~0.6% for rot_order=1, ~2% for rot_order=3 at 45 deg).
+                  Requires the opencv-python package.
+            Default is 'scipy'.
                         
         Keyword Args
         ------------
@@ -585,11 +676,26 @@ class JWST_PSF():
             psf = psf.reshape([-1,ny,nx])
             # Get aperture position angle
             PA_ap = PA_V3 + siaf_ap.V3IdlYAngle
-            psf = rotate(psf, -PA_ap, reshape=False, mode='constant', cval=0, axes=(-1,-2))
+            if rot_method == 'opencv':
+                if not OPENCV_EXISTS:
+                    raise ImportError('opencv-python not installed')
+                cv2_flags = {0: cv2.INTER_NEAREST, 1: cv2.INTER_LINEAR, 3: cv2.INTER_CUBIC}
+                if rot_order not in cv2_flags:
+                    raise ValueError(f"rot_order={rot_order} not supported with rot_method='opencv', options are 0, 1 or 3.")
+                flags = cv2_flags[rot_order]
+                M = cv2.getRotationMatrix2D(((nx - 1) / 2., (ny - 1) / 2.), -PA_ap, 1.)
+                psf = np.array([cv2.warpAffine(im, M, (nx, ny), flags=flags, 
+                                               borderMode=cv2.BORDER_CONSTANT, borderValue=0.)
+                                for im in psf])
+            elif rot_method == 'scipy':
+                psf = rotate(psf, -PA_ap, reshape=False, mode='constant', cval=0, axes=(-1,-2),
+                             order=rot_order)
+            else:
+                raise ValueError(f"Rotation method {rot_method} not supported, options are 'scipy' or 'opencv'.")
         
         # Resample to detector pixels?
         if not return_oversample:
-            psf = frebin(psf, scale=1/osamp)
+            psf = _rebin_psf(psf, osamp)
         
         psf = psf.squeeze()
         
@@ -614,6 +720,197 @@ def _sp_to_spext(sp, **kwargs):
     return sp
 
 
+def _rebin_psf(psf, osamp):
+    """
+    Bin an oversampled PSF (or PSF cube) down to detector pixels, conserving
+    the total flux.
+    
+    Integer oversampling factors are handled by summing blocks of pixels of
+    the whole cube at once. Otherwise, falls back to `frebin`.
+    """
+    
+    ny, nx = psf.shape[-2:]
+    osamp_int = int(osamp)
+    if osamp_int == osamp and ny % osamp_int == 0 and nx % osamp_int == 0:
+        shape = psf.shape[:-2] + (ny // osamp_int, osamp_int, nx // osamp_int, osamp_int)
+        return psf.reshape(shape).sum(axis=(-3, -1))
+    else:
+        return frebin(psf, scale=1/osamp)
+
+
+def _nanrotate_cv2(img, angle, center, new_center=None):
+    """
+    Same as `pyklip.klip.rotate`, but using a bilinear OpenCV affine warp.
+    Bilinear interpolation is smoother than the cubic spline of pyklip, so
+    results differ by up to ~6% of the peak near sharp mask edges.
+    
+    Nans are replaced by zeros before the warp and a map of the valid
+    pixels is warped alongside the image. Output pixels that received any
+    weight from nan or out-of-bounds pixels are set to nan, like in
+    `pyklip.klip.rotate`.
+    """
+    
+    if new_center is None:
+        new_center = center
+    
+    # Inverse mapping from output to input pixel coordinates, same (CCW)
+    # convention as `pyklip.klip.rotate`.
+    angle_rad = np.deg2rad(angle)
+    cos, sin = np.cos(angle_rad), np.sin(angle_rad)
+    M = np.array([[cos, sin, center[0] - new_center[0] * cos - new_center[1] * sin],
+                  [-sin, cos, center[1] + new_center[0] * sin - new_center[1] * cos]])
+    
+    ny, nx = img.shape
+    flags = cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP
+    dtype = np.result_type(img.dtype, np.float32)
+    valid = ~np.isnan(img)
+    rotimg = cv2.warpAffine(np.where(valid, img, 0.).astype(dtype, copy=False), M, (nx, ny), flags=flags,
+                            borderMode=cv2.BORDER_CONSTANT, borderValue=0.)
+    weight = cv2.warpAffine(valid.astype(dtype), M, (nx, ny), flags=flags,
+                            borderMode=cv2.BORDER_CONSTANT, borderValue=0.)
+    rotimg[weight < 1. - 1e-3] = np.nan
+    
+    return rotimg
+
+
+def _nanrotate(img, angle, center, new_center=None, method='pyklip'):
+    """
+    Same as `pyklip.klip.rotate`, but rotations by multiples of 90 degrees
+    that map the pixel grid onto itself are done by exact index permutation
+    instead of spline interpolation.
+    
+    Pixels that fall outside of the input image are set to nan, like in
+    `pyklip.klip.rotate`. All other rotations are interpolated with
+    `pyklip.klip.rotate` (method='pyklip') or with a faster bilinear OpenCV
+    warp (method='opencv'), which requires the opencv-python package.
+    """
+    
+    if method not in ['pyklip', 'opencv']:
+        raise ValueError("method must be 'pyklip' or 'opencv'")
+    if method == 'opencv' and not OPENCV_EXISTS:
+        raise ImportError('opencv-python not installed')
+    def interp_rotate():
+        if method == 'opencv':
+            return _nanrotate_cv2(img, angle, center, new_center=new_center)
+        else:
+            return nanrotate(img, angle, center=center, new_center=new_center)
+    
+    # Only orthogonal rotations are exact permutations of the pixel grid.
+    k = int(np.round(angle / 90.))
+    if np.abs(angle - 90. * k) > 1e-6:
+        return interp_rotate()
+    
+    # Same (CCW) convention as `pyklip.klip.rotate`, with exact sines and
+    # cosines.
+    cos, sin = [(1, 0), (0, 1), (-1, 0), (0, -1)][k % 4]
+    if new_center is None:
+        new_center = center
+    x = np.arange(img.shape[1]) - new_center[0]
+    y = np.arange(img.shape[0]) - new_center[1]
+    xp = x[np.newaxis, :] * cos + y[:, np.newaxis] * sin + center[0]
+    yp = -x[np.newaxis, :] * sin + y[:, np.newaxis] * cos + center[1]
+    
+    # The mapping is only a permutation if it hits integer pixels, which is
+    # the case for all pixels if it is the case for the first one.
+    if np.abs(xp[0, 0] - np.round(xp[0, 0])) > 1e-6 or np.abs(yp[0, 0] - np.round(yp[0, 0])) > 1e-6:
+        return interp_rotate()
+    xp = np.round(xp).astype(int)
+    yp = np.round(yp).astype(int)
+    ww = (xp >= 0) & (xp < img.shape[1]) & (yp >= 0) & (yp < img.shape[0])
+    rotimg = np.full(img.shape, np.nan, dtype=np.result_type(img.dtype, np.float32))
+    rotimg[ww] = img[yp[ww], xp[ww]]
+    
+    return rotimg
+
+
+@lru_cache(maxsize=16)
+def _shift_phasor(shape, xshift, yshift):
+    """
+    Fourier-space phase ramp that shifts an image of the given shape by
+    (xshift, yshift) pixels.
+    
+    The ramp is separable, so it is built from the outer product of two 1D
+    exponentials. It is cached and returned read-only.
+    """
+    
+    ny, nx = shape
+    phasor_y = np.exp(-2j * np.pi * yshift * sp_fft.fftfreq(ny))
+    phasor_x = np.exp(-2j * np.pi * xshift * sp_fft.fftfreq(nx))
+    phasor = np.outer(phasor_y, phasor_x)
+    phasor.flags.writeable = False
+    
+    return phasor
+
+
+def _fourier_imshift(image, xshift, yshift, pad=False, cval=0.0):
+    """
+    Fourier shift an image or an image cube.
+    
+    Same as `webbpsf_ext.image_manip.fourier_imshift`, but all images of a
+    cube are shifted with a single multithreaded `scipy.fft` call and the
+    phase ramp is cached. Padded images are extended to an efficient FFT
+    size. Each image of a cube can also be shifted by a different amount.
+    
+    Parameters
+    ----------
+    image : ndarray
+        2D image or 3D image cube [nz,ny,nx].
+    xshift : float or 1D-array
+        Number of pixels to shift image in the x direction. Can be an array
+        with one value per image of a cube.
+    yshift : float or 1D-array
+        Number of pixels to shift image in the y direction. Can be an array
+        with one value per image of a cube.
+    pad : bool
+        Should we pad the array before shifting, then truncate?
+        Otherwise, the image is wrapped.
+    cval : float
+        Value of the padded pixels. Default is 0.
+    
+    Returns
+    -------
+    ndarray
+        Shifted image.
+    
+    """
+    
+    ny, nx = image.shape[-2:]
+    xshift = np.asarray(xshift, dtype=float)
+    yshift = np.asarray(yshift, dtype=float)
+    
+    # Nothing to do for negligible shifts
+    if np.all(np.abs(xshift) < 1e-6) and np.all(np.abs(yshift) < 1e-6):
+        return image.copy()
+    
+    # Pad ends with constant values, extending the trailing edge to the next
+    # efficient FFT size
+    if pad:
+        padx = int(np.max(np.abs(xshift.astype(int)))) + 5
+        pady = int(np.max(np.abs(yshift.astype(int)))) + 5
+        padx_end = sp_fft.next_fast_len(nx + 2 * padx, real=True) - nx - padx
+        pady_end = sp_fft.next_fast_len(ny + 2 * pady, real=True) - ny - pady
+        pad_vals = [(0, 0)] * (image.ndim - 2) + [(pady, pady_end), (padx, padx_end)]
+        im = np.pad(image, pad_vals, 'constant', constant_values=cval)
+    else:
+        padx = pady = 0
+        im = image
+    
+    # Apply the phase ramp to all images at once
+    if xshift.ndim == 0 and yshift.ndim == 0:
+        phasor = _shift_phasor(im.shape[-2:], float(xshift), float(yshift))
+    else:
+        # Separate phase ramp for each image of the cube
+        xshift, yshift = np.broadcast_arrays(xshift.ravel(), yshift.ravel())
+        phasor_y = np.exp(-2j * np.pi * yshift[:, None] * sp_fft.fftfreq(im.shape[-2]))
+        phasor_x = np.exp(-2j * np.pi * xshift[:, None] * sp_fft.fftfreq(im.shape[-1]))
+        phasor = phasor_y[:, :, None] * phasor_x[:, None, :]
+    im_fft = sp_fft.fft2(im, axes=(-2, -1), workers=-1)
+    im_fft *= phasor.astype(im_fft.dtype, copy=False)
+    offset = sp_fft.ifft2(im_fft, axes=(-2, -1), overwrite_x=True, workers=-1).real
+    
+    return offset[..., pady:pady+ny, padx:padx+nx]
+
+
 def recenter_jens(image):
     """
     Find the shift that centers a PSF on its nearest pixel by maximizing its
@@ -631,13 +928,18 @@ def recenter_jens(image):
     
     """
 
-    from .utils import recenterlsq
+    # The Fourier transform of the image does not depend on the shift, so only
+    # compute it once. This is equivalent to utils.recenterlsq, which would
+    # recompute it for every evaluation of the minimizer.
+    image_fft = np.fft.fftn(image)
+    
+    def invpeak(shift):
+        return 1. / np.nanmax(np.fft.ifftn(fourier_shift(image_fft, shift[::-1])).real)
     
     # Find the shift that recenters the image.
     p0 = np.array([0., 0.])
-    shift = minimize(recenterlsq,
-                     p0,
-                     args=(image))['x']
+    shift = minimize(invpeak,
+                     p0)['x']
     
     return shift
 
@@ -689,15 +991,16 @@ def get_offsetpsf(obs,
     # Derotate the offset PSF and coadd it weighted by the integration time of
     # the different rolls. Scipy.ndimage.rotate rotates around the image
     # center, i.e., (32, 32) for an image of size (65, 65).
+    # Rolls with the same roll angle only need to be rotated once.
     if derotate:
-        totpsf = []
-        totexp = 0.  # s
-        for j in ww_sci:
-            totint = obs['NINTS'][j] * obs['EFFINTTM'][j]  # s
-            totpsf += [totint * rotate(offsetpsf.copy(), -obs['ROLL_REF'][j], reshape=False, mode='constant', cval=0.)]
-            totexp += totint  # s
-        totpsf = np.array(totpsf)
-        totpsf = np.sum(totpsf, axis=0) / totexp
+        totint = np.asarray(obs['NINTS'][ww_sci] * obs['EFFINTTM'][ww_sci], dtype=float)  # s
+        rolls, ww_roll = np.unique(np.asarray(obs['ROLL_REF'][ww_sci], dtype=float), return_inverse=True)  # deg
+        weights = np.bincount(ww_roll.ravel(), weights=totint)  # s
+        # Compute the spline coefficients of the offset PSF only once for all
+        # rotations.
+        offsetpsf_coeff = spline_filter(offsetpsf, order=3, mode='mirror')
+        rotpsf = np.array([rotate(offsetpsf_coeff, -roll, reshape=False, mode='constant', cval=0., prefilter=False) for roll in rolls])
+        totpsf = np.einsum('i,ijk->jk', weights, rotpsf) / np.sum(totint)
     else:
         totpsf = offsetpsf
     
@@ -709,6 +1012,8 @@ def gen_offsetpsf(obs,
                   source=None):
     """
     Generate a WebbPSF model PSF. The total intensity will be normalized to 1.
+    Model PSFs without a custom source spectrum are cached for the duration
+    of the Python session.
     
     Parameters
     ----------
@@ -736,6 +1041,16 @@ def gen_offsetpsf(obs,
     # Find the science target observations.
     ww_sci = np.where(obs['TYPE'] == 'SCI')[0]
     
+    # Return a cached model PSF if the same setup was computed before. Custom
+    # source spectra are not hashable, so these are always recomputed.
+    cache_key = None
+    if source is None:
+        cache_key = tuple(str(obs[col][ww_sci[0]]) for col in ['TELESCOP', 'INSTRUME', 'FILTER', 'PUPIL', 'CORONMSK'])
+        cache_key += (None if xyoff is None else tuple(xyoff), date)
+        if cache_key in _offsetpsf_cache:
+            log.info('  --> Using cached WebbPSF model')
+            return _offsetpsf_cache[cache_key].copy()
+    
     # JWST.
     if obs['TELESCOP'][ww_sci[0]] == 'JWST':
         
@@ -819,10 +1134,13 @@ def gen_offsetpsf(obs,
     # Generate offset PSF.
     hdul = webbpsf_inst.calc_psf(oversample=1, fov_pixels=65, normalize='exit_pupil', source=source)
     offsetpsf = hdul[0].data
+    if cache_key is not None:
+        _offsetpsf_cache[cache_key] = offsetpsf.copy()
     
     return offsetpsf
 
-def get_transmission(obs):
+def get_transmission(obs,
+                     rot_method='pyklip'):
     """
     Compute a derotated and integration time weighted average of the
     transmission mask.
@@ -833,43 +1151,62 @@ def get_transmission(obs):
         Concatenation of a spaceKLIP observations database for which the
         derotated and integration time weighted average of the transmission
         mask shall be computed.
+    rot_method : str, optional
+        Interpolation used to derotate the transmission mask. 'pyklip' uses
+        the spline interpolation of `pyklip.klip.rotate`, 'opencv' uses a
+        faster bilinear OpenCV warp, which differs from pyklip by up to ~6%
+        near sharp mask edges, and raises an ImportError if the
+        opencv-python package is not installed. Rotations by multiples of
+        90 degrees are always exact. The default is 'pyklip'.
     
     Returns
     -------
     totmsk : 2D-array
         Derotated and integration time weighted average of the transmission
-        mask.
+        mask. Kept in single precision, which is plenty for transmission
+        values between 0 and 1.
     
     """
     
     # Find the science target observations.
-    ww_sci = np.where(obs['TYPE'] == 'SCI')[0]
+    obs_sci = obs[obs['TYPE'] == 'SCI']
     
     # Derotate the transmission mask and coadd it weighted by the integration
     # time of the different rolls.
-    totmsk = []
+    totmsk = None
+    valid = None
     totexp = 0.  # s
-    for j in ww_sci:
+    masks = {}
+    for row in obs_sci:
         
         # If there is no transmission mask for any of the rolls, return None.
-        if obs['MASKFILE'][j] == 'NONE':
+        if row['MASKFILE'] == 'NONE':
             return None
         
-        # Else compute and return the transmission mask.
-        hdul = pyfits.open(obs['MASKFILE'][j])
-        mask = hdul['SCI'].data
-        hdul.close()
-        totint = obs['NINTS'][j] * obs['EFFINTTM'][j]  # s
-        center = [obs['CRPIX1'][j] - 1., obs['CRPIX2'][j] - 1.]  # pix (0-indexed)
+        # Else compute and return the transmission mask. Rolls that share
+        # the same mask file only read it once.
+        maskfile = row['MASKFILE']
+        if maskfile not in masks:
+            with pyfits.open(maskfile, memmap=False) as hdul:
+                masks[maskfile] = hdul['SCI'].data.astype(np.float32, copy=False)
+        mask = masks[maskfile]
+        if totmsk is None:
+            totmsk = np.zeros(mask.shape, dtype=np.float32)
+            valid = np.zeros(mask.shape, dtype=bool)
+        totint = row['NINTS'] * row['EFFINTTM']  # s
+        center = [row['CRPIX1'] - 1., row['CRPIX2'] - 1.]  # pix (0-indexed)
         new_center = [mask.shape[1] // 2, mask.shape[0] // 2]  # pix (0-indexed)
-        totmsk += [totint * nanrotate(mask.copy(), obs['ROLL_REF'][j], center=center, new_center=new_center)]
+        
+        # Accumulate the weighted mask in place, skipping nans.
+        rot = _nanrotate(mask, row['ROLL_REF'], center=center, new_center=new_center, method=rot_method)
+        ww = ~np.isnan(rot)
+        rot *= np.float32(totint)
+        np.add(totmsk, rot, out=totmsk, where=ww)
+        valid |= ww
         totexp += totint  # s
-    totmsk = np.array(totmsk)
     
-    # Correctly handle nans.
-    ww = np.isnan(totmsk)
-    ww = np.sum(ww, axis=0) == ww.shape[0]
-    totmsk = np.nansum(totmsk, axis=0) / totexp
-    totmsk[ww] = np.nan
+    # Correctly handle nans, i.e., pixels that are nan in all rolls.
+    totmsk /= np.float32(totexp)
+    totmsk[~valid] = np.nan
     
     return totmsk
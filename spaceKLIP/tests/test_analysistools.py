@@ -0,0 +1,28 @@
+import numpy as np
+
+import pytest
+
+from pyklip import klip
+from spaceKLIP.analysistools import meas_contrast_cube
+
+
+@pytest.mark.parametrize('center', [None, (30.3, 28.7)])
+def test_meas_contrast_cube(center):
+    """ meas_contrast_cube should match pyklip.klip.meas_contrast without
+    low-pass filtering, frame by frame.
+
+    """
+
+    rng = np.random.default_rng(0)
+    dat = rng.normal(size=(3, 61, 64))
+    dat[:, 25:35, 28:36] = np.nan
+
+    iwa, owa, resolution = 4., 25., 3.
+    seps, cons = meas_contrast_cube(dat, iwa, owa, resolution, center=center)
+
+    assert cons.shape == (dat.shape[0], len(seps)), "Contrast curves do not have the expected shape"
+    for k in range(dat.shape[0]):
+        seps_ref, cons_ref = klip.meas_contrast(dat[k], iwa, owa, resolution, center=center,
+                                                low_pass_filter=False)
+        assert np.allclose(seps, seps_ref), "Separations differ from pyklip"
+        assert np.allclose(cons[k], cons_ref, equal_nan=True), "Contrast differs from pyklip"
@@ -0,0 +1,26 @@
+import numpy as np
+
+import pytest
+
+from scipy.ndimage import binary_dilation
+from spaceKLIP.coron1pipeline import _grow_mask_cross
+
+
+@pytest.mark.parametrize('npix', [0, 1, 2, 3])
+def test_grow_mask_cross(npix):
+    """ _grow_mask_cross should match image by image binary dilation without
+    diagonals, as done by webbpsf_ext's expand_mask.
+
+    """
+
+    rng = np.random.default_rng(0)
+    mask = rng.random((2, 3, 30, 31)) > 0.97
+
+    res = _grow_mask_cross(mask, npix)
+    if npix == 0:
+        ref = mask
+    else:
+        ref = np.array([[binary_dilation(im, iterations=npix) for im in integ] for integ in mask])
+
+    assert res.dtype == bool, "Grown mask is not boolean"
+    assert np.array_equal(res, ref), "Grown mask differs from binary_dilation"
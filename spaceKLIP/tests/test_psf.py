@@ -0,0 +1,76 @@
+import numpy as np
+
+import pytest
+
+from pyklip.klip import rotate as nanrotate
+from webbpsf_ext.image_manip import fourier_imshift, frebin
+from spaceKLIP.psf import _fourier_imshift, _nanrotate, _rebin_psf
+
+
+def _gaussian_image(ny=64, nx=70, x0=33.2, y0=30.6, sigma=3.):
+    yy, xx = np.mgrid[:ny, :nx]
+    return np.exp(-((xx - x0)**2 + (yy - y0)**2) / (2 * sigma**2))
+
+
+@pytest.mark.parametrize('pad', [False, True])
+def test_fourier_imshift(pad):
+    """ _fourier_imshift should match webbpsf_ext's fourier_imshift for
+    images and cubes, including per-image shifts.
+
+    """
+
+    image = _gaussian_image()
+    cube = np.array([image, 2 * image, image[::-1]])
+
+    res = _fourier_imshift(image, 2.3, -1.7, pad=pad)
+    ref = fourier_imshift(image, 2.3, -1.7, pad=pad)
+    assert np.allclose(res, ref, atol=1e-6), "2D shift differs from fourier_imshift"
+
+    res = _fourier_imshift(cube, 2.3, -1.7, pad=pad)
+    ref = fourier_imshift(cube, 2.3, -1.7, pad=pad)
+    assert np.allclose(res, ref, atol=1e-6), "3D shift differs from fourier_imshift"
+
+    xsh = np.array([0.4, -3.2, 1.1])
+    ysh = np.array([-2.5, 0.7, 0.])
+    res = _fourier_imshift(cube, xsh, ysh, pad=pad)
+    for k in range(cube.shape[0]):
+        ref = fourier_imshift(cube[k], xsh[k], ysh[k], pad=pad)
+        assert np.allclose(res[k], ref, atol=1e-6), "Per-image shift differs from fourier_imshift"
+
+
+@pytest.mark.parametrize('angle', [0., 90., 180., -90., 12.5])
+@pytest.mark.parametrize('center, new_center', [([31., 30.], [31, 30]),
+                                                ([29., 33.], [32, 32]),
+                                                ([31.4, 30.2], [32, 32])])
+def test_nanrotate(angle, center, new_center):
+    """ _nanrotate should match pyklip's rotate, except for the few nans
+    that pyklip adds from floating point round-off in exact rotations.
+
+    """
+
+    image = _gaussian_image()
+    image[10, 12] = np.nan
+
+    res = _nanrotate(image, angle, center, new_center=new_center)
+    ref = nanrotate(image, angle, center, new_center=new_center)
+
+    assert res.shape == ref.shape, "Rotated image has the wrong shape"
+    valid = ~np.isnan(res) & ~np.isnan(ref)
+    assert np.mean(np.isnan(res) != np.isnan(ref)) < 0.02, "Nan pixels differ from pyklip"
+    assert np.allclose(res[valid], ref[valid], atol=1e-10), "Rotated image differs from pyklip"
+
+
+@pytest.mark.parametrize('osamp', [2, 4])
+def test_rebin_psf(osamp):
+    """ _rebin_psf should match webbpsf_ext's frebin for integer
+    oversampling of images and cubes.
+
+    """
+
+    image = _gaussian_image(ny=16*osamp, nx=12*osamp)
+    cube = np.array([image, 3 * image])
+
+    ref = frebin(image, scale=1/osamp)
+    assert np.allclose(_rebin_psf(image, osamp), ref), "Binned image differs from frebin"
+    ref = frebin(cube, scale=1/osamp)
+    assert np.allclose(_rebin_psf(cube, osamp), ref), "Binned cube differs from frebin"